@@ -10,26 +10,28 @@
 //!     └ fieldN: val1<delim>val2<delim>...
 
 use serde_json::{Map, Value};
+use std::collections::HashSet;
+use std::fmt::Write;
 
 use crate::error::{AgonError, Result};
+use crate::utils::{self, LineWriter};
 
 const HEADER: &str = "@AGON columns";
 const DEFAULT_DELIMITER: &str = "\t";
-const INDENT: &str = "  ";
 
 /// Encode data to AGONColumns format
 pub fn encode(data: &Value, include_header: bool) -> Result<String> {
-    let mut lines = Vec::new();
+    let mut lines = LineWriter::new();
     let delimiter = DEFAULT_DELIMITER;
 
     if include_header {
-        lines.push(HEADER.to_string());
-        lines.push(String::new());
+        lines.push(HEADER);
+        lines.push("");
     }
 
     encode_value(data, &mut lines, 0, delimiter, None);
 
-    Ok(lines.join("\n"))
+    Ok(lines.into_string())
 }
 
 /// Decode AGONColumns payload
@@ -69,26 +71,77 @@ pub fn decode(payload: &str) -> Result<Value> {
 // ============================================================================
 
 fn format_primitive(val: &Value) -> String {
+    let mut out = String::new();
+    push_primitive(&mut out, val);
+    out
+}
+
+/// Append the encoded form of a primitive to `out`
+fn push_primitive(out: &mut String, val: &Value) {
     match val {
-        Value::Null => "null".to_string(),
-        Value::Bool(b) => if *b { "true" } else { "false" }.to_string(),
-        Value::Number(n) => n.to_string(),
+        Value::Null => out.push_str("null"),
+        Value::Bool(b) => out.push_str(if *b { "true" } else { "false" }),
+        Value::Number(n) => {
+            let _ = write!(out, "{}", n);
+        }
         Value::String(s) => {
             // Quote if contains delimiter, special chars, or could be parsed as another type
             if needs_quote(s) {
-                format!(
-                    "\"{}\"",
-                    s.replace('\\', "\\\\")
-                        .replace('"', "\\\"")
-                        .replace('\n', "\\n")
-                        .replace('\t', "\\t")
-                )
+                push_quoted(out, s);
             } else {
-                s.clone()
+                out.push_str(s);
+            }
+        }
+        _ => out.push_str(&serde_json::to_string(val).unwrap_or_default()),
+    }
+}
+
+/// Owned-string form of `push_quoted`
+#[cfg(test)]
+fn quote_string(s: &str) -> String {
+    let mut out = String::with_capacity(s.len() + 2);
+    push_quoted(&mut out, s);
+    out
+}
+
+/// Quote a string onto `out`, escaping backslash, quote, newline and tab in one pass
+fn push_quoted(out: &mut String, s: &str) {
+    out.reserve(s.len() + 2);
+    out.push('"');
+    for c in s.chars() {
+        match c {
+            '\\' => out.push_str("\\\\"),
+            '"' => out.push_str("\\\""),
+            '\n' => out.push_str("\\n"),
+            '\t' => out.push_str("\\t"),
+            _ => out.push(c),
+        }
+    }
+    out.push('"');
+}
+
+/// Reverse `quote_string` escapes in one pass; unknown escapes are kept as-is
+fn unescape(inner: &str) -> String {
+    let mut out = String::with_capacity(inner.len());
+    let mut chars = inner.chars();
+    while let Some(c) = chars.next() {
+        if c != '\\' {
+            out.push(c);
+            continue;
+        }
+        match chars.next() {
+            Some('n') => out.push('\n'),
+            Some('t') => out.push('\t'),
+            Some('"') => out.push('"'),
+            Some('\\') => out.push('\\'),
+            Some(other) => {
+                out.push('\\');
+                out.push(other);
             }
+            None => out.push('\\'),
         }
-        _ => serde_json::to_string(val).unwrap_or_default(),
     }
+    out
 }
 
 /// Check if a string needs quoting to preserve its type
@@ -115,15 +168,15 @@ fn needs_quote(s: &str) -> bool {
         return true;
     }
     // Boolean/null keywords
-    let lower = s.to_lowercase();
-    if lower == "true" || lower == "false" || lower == "null" {
-        return true;
-    }
-    // Looks like a number - needs quoting to preserve string type
-    if s.parse::<i64>().is_ok() || s.parse::<f64>().is_ok() {
+    if ["true", "false", "null"]
+        .iter()
+        .any(|kw| s.eq_ignore_ascii_case(kw))
+    {
         return true;
     }
-    false
+    // Looks like a number - needs quoting to preserve string type. Every i64
+    // literal also parses as f64, and the prefilter skips the parse for words
+    utils::may_parse_float(s) && s.parse::<f64>().is_ok()
 }
 
 fn parse_primitive(s: &str) -> Value {
@@ -134,14 +187,7 @@ fn parse_primitive(s: &str) -> Value {
 
     // Quoted string
     if s.starts_with('"') && s.ends_with('"') {
-        let inner = &s[1..s.len() - 1];
-        return Value::String(
-            inner
-                .replace("\\n", "\n")
-                .replace("\\t", "\t")
-                .replace("\\\"", "\"")
-                .replace("\\\\", "\\"),
-        );
+        return Value::String(unescape(&s[1..s.len() - 1]));
     }
 
     // Boolean/null
@@ -177,34 +223,26 @@ fn parse_columnar_cell(s: &str) -> Option<Value> {
     Some(parse_primitive(s))
 }
 
-fn is_uniform_array(arr: &[Value]) -> (bool, Vec<String>) {
+fn is_uniform_array(arr: &[Value]) -> (bool, Vec<&str>) {
     if arr.is_empty() {
         return (false, vec![]);
     }
 
-    if !arr.iter().all(|v| v.is_object()) {
-        return (false, vec![]);
-    }
-
-    // Check all values are primitives
-    for obj in arr {
-        if let Some(map) = obj.as_object() {
-            for v in map.values() {
-                if v.is_object() || v.is_array() {
-                    return (false, vec![]);
-                }
-            }
-        }
-    }
-
-    // Collect keys in order
+    // Single pass: every item must be an object of primitives, and keys are
+    // collected in first-seen order along the way (set keeps lookups O(1)).
+    // Keys are borrowed from the input; nothing is copied per field.
+    let mut seen = HashSet::new();
     let mut key_order = Vec::new();
     for obj in arr {
-        if let Some(map) = obj.as_object() {
-            for k in map.keys() {
-                if !key_order.contains(k) {
-                    key_order.push(k.clone());
-                }
+        let Some(map) = obj.as_object() else {
+            return (false, vec![]);
+        };
+        for (k, v) in map {
+            if v.is_object() || v.is_array() {
+                return (false, vec![]);
+            }
+            if seen.insert(k.as_str()) {
+                key_order.push(k.as_str());
             }
         }
     }
@@ -214,20 +252,20 @@ fn is_uniform_array(arr: &[Value]) -> (bool, Vec<String>) {
 
 fn encode_value(
     val: &Value,
-    lines: &mut Vec<String>,
+    lines: &mut LineWriter,
     depth: usize,
     delimiter: &str,
     name: Option<&str>,
 ) {
-    let indent = INDENT.repeat(depth);
+    let indent = utils::indent(depth);
 
     match val {
         Value::Null | Value::Bool(_) | Value::Number(_) | Value::String(_) => {
             let encoded = format_primitive(val);
             if let Some(n) = name {
-                lines.push(format!("{}{}: {}", indent, n, encoded));
+                lines.push_fmt(format_args!("{}{}: {}", indent, n, encoded));
             } else {
-                lines.push(format!("{}{}", indent, encoded));
+                lines.push_fmt(format_args!("{}{}", indent, encoded));
             }
         }
         Value::Array(arr) => {
@@ -241,18 +279,18 @@ fn encode_value(
 
 fn encode_array(
     arr: &[Value],
-    lines: &mut Vec<String>,
+    lines: &mut LineWriter,
     depth: usize,
     delimiter: &str,
     name: Option<&str>,
 ) {
-    let indent = INDENT.repeat(depth);
+    let indent = utils::indent(depth);
 
     if arr.is_empty() {
         if let Some(n) = name {
-            lines.push(format!("{}{}[0]", indent, n));
+            lines.push_fmt(format_args!("{}{}[0]", indent, n));
         } else {
-            lines.push(format!("{}[0]", indent));
+            lines.push_fmt(format_args!("{}[0]", indent));
         }
         return;
     }
@@ -262,32 +300,48 @@ fn encode_array(
     if is_uniform && !fields.is_empty() {
         // Columnar header
         if let Some(n) = name {
-            lines.push(format!("{}{}[{}]", indent, n, arr.len()));
+            lines.push_fmt(format_args!("{}{}[{}]", indent, n, arr.len()));
         } else {
-            lines.push(format!("{}[{}]", indent, arr.len()));
+            lines.push_fmt(format_args!("{}[{}]", indent, arr.len()));
+        }
+
+        // Transpose in a single row-major pass, writing each cell straight into
+        // its column's output buffer. Rows whose keys already match the column
+        // order are read positionally, skipping per-field lookups.
+        let mut columns: Vec<String> = vec![String::new(); fields.len()];
+        for (row, map) in arr.iter().filter_map(Value::as_object).enumerate() {
+            if row > 0 {
+                for column in &mut columns {
+                    column.push_str(delimiter);
+                }
+            }
+            if map.len() == fields.len() && map.keys().zip(&fields).all(|(k, f)| k == f) {
+                for (column, v) in columns.iter_mut().zip(map.values()) {
+                    push_primitive(column, v);
+                }
+            } else {
+                for (column, field) in columns.iter_mut().zip(&fields) {
+                    if let Some(v) = map.get(*field) {
+                        push_primitive(column, v);
+                    }
+                }
+            }
+        }
+
+        // Drop the separators of trailing missing cells; a short column
+        // decodes with the remaining rows missing. Present cells never end in
+        // the delimiter (strings containing it are quoted), so this only
+        // removes empty slots.
+        for column in &mut columns {
+            let end = column.trim_end_matches(delimiter).len();
+            column.truncate(end);
         }
 
         // Output each field as a column
         let total_fields = fields.len();
-        for (i, field) in fields.iter().enumerate() {
-            let values: Vec<String> = arr
-                .iter()
-                .map(|obj| {
-                    obj.as_object()
-                        .and_then(|m| m.get(field))
-                        .map(format_primitive)
-                        .unwrap_or_default()
-                })
-                .collect();
-
+        for (i, (field, values)) in fields.iter().zip(&columns).enumerate() {
             let prefix = if i == total_fields - 1 { "└" } else { "├" };
-            lines.push(format!(
-                "{}{} {}: {}",
-                indent,
-                prefix,
-                field,
-                values.join(delimiter)
-            ));
+            lines.push_fmt(format_args!("{}{} {}: {}", indent, prefix, field, values));
         }
         return;
     }
@@ -296,7 +350,7 @@ fn encode_array(
     if arr.iter().all(|v| !v.is_object() && !v.is_array()) {
         let values: Vec<String> = arr.iter().map(format_primitive).collect();
         if let Some(n) = name {
-            lines.push(format!(
+            lines.push_fmt(format_args!(
                 "{}{}[{}]: {}",
                 indent,
                 n,
@@ -304,7 +358,7 @@ fn encode_array(
                 values.join(delimiter)
             ));
         } else {
-            lines.push(format!(
+            lines.push_fmt(format_args!(
                 "{}[{}]: {}",
                 indent,
                 arr.len(),
@@ -316,9 +370,9 @@ fn encode_array(
 
     // Mixed/nested - use list item format
     if let Some(n) = name {
-        lines.push(format!("{}{}[{}]:", indent, n, arr.len()));
+        lines.push_fmt(format_args!("{}{}[{}]:", indent, n, arr.len()));
     } else {
-        lines.push(format!("{}[{}]:", indent, arr.len()));
+        lines.push_fmt(format_args!("{}[{}]:", indent, arr.len()));
     }
     for item in arr {
         match item {
@@ -326,7 +380,7 @@ fn encode_array(
                 encode_list_item_object(obj, lines, depth + 1, delimiter);
             }
             _ => {
-                lines.push(format!("{}  - {}", indent, format_primitive(item)));
+                lines.push_fmt(format_args!("{}  - {}", indent, format_primitive(item)));
             }
         }
     }
@@ -335,11 +389,11 @@ fn encode_array(
 /// Encode an object as a list item (- key: value format)
 fn encode_list_item_object(
     obj: &Map<String, Value>,
-    lines: &mut Vec<String>,
+    lines: &mut LineWriter,
     depth: usize,
     delimiter: &str,
 ) {
-    let indent = INDENT.repeat(depth);
+    let indent = utils::indent(depth);
     let mut first = true;
 
     for (k, v) in obj {
@@ -352,24 +406,29 @@ fn encode_list_item_object(
 
         match v {
             Value::Object(nested) => {
-                lines.push(format!("{}{}:", prefix, k));
+                lines.push_fmt(format_args!("{}{}:", prefix, k));
                 for (nk, nv) in nested {
                     match nv {
                         Value::Object(_) | Value::Array(_) => {
                             encode_value(nv, lines, depth + 2, delimiter, Some(nk));
                         }
                         _ => {
-                            lines.push(format!("{}    {}: {}", indent, nk, format_primitive(nv)));
+                            lines.push_fmt(format_args!(
+                                "{}    {}: {}",
+                                indent,
+                                nk,
+                                format_primitive(nv)
+                            ));
                         }
                     }
                 }
             }
             Value::Array(arr) => {
-                lines.push(format!("{}{}:", prefix, k));
+                lines.push_fmt(format_args!("{}{}:", prefix, k));
                 encode_array(arr, lines, depth + 2, delimiter, None);
             }
             _ => {
-                lines.push(format!("{}{}: {}", prefix, k, format_primitive(v)));
+                lines.push_fmt(format_args!("{}{}: {}", prefix, k, format_primitive(v)));
             }
         }
     }
@@ -377,20 +436,20 @@ fn encode_list_item_object(
 
 fn encode_object(
     obj: &Map<String, Value>,
-    lines: &mut Vec<String>,
+    lines: &mut LineWriter,
     depth: usize,
     delimiter: &str,
     name: Option<&str>,
 ) {
-    let indent = INDENT.repeat(depth);
+    let indent = utils::indent(depth);
     let mut actual_depth = depth;
 
     if let Some(n) = name {
-        lines.push(format!("{}{}:", indent, n));
+        lines.push_fmt(format_args!("{}{}:", indent, n));
         actual_depth += 1;
     }
 
-    let actual_indent = INDENT.repeat(actual_depth);
+    let actual_indent = utils::indent(actual_depth);
 
     for (k, v) in obj {
         match v {
@@ -398,7 +457,12 @@ fn encode_object(
                 encode_value(v, lines, actual_depth, delimiter, Some(k));
             }
             _ => {
-                lines.push(format!("{}{}: {}", actual_indent, k, format_primitive(v)));
+                lines.push_fmt(format_args!(
+                    "{}{}: {}",
+                    actual_indent,
+                    k,
+                    format_primitive(v)
+                ));
             }
         }
     }
@@ -512,8 +576,10 @@ fn decode_columnar_array(
         if let Some(content) = field_line {
             if let Some(colon_pos) = content.find(':') {
                 let field = content[..colon_pos].trim();
-                // Don't strip trailing whitespace - it's part of delimiter for empty cells
-                let values_str = content[colon_pos + 1..].trim_start();
+                // Only the separator space is dropped: a leading delimiter
+                // marks a missing first cell, and cells are trimmed when parsed
+                let values_str = content[colon_pos + 1..].strip_prefix(' ');
+                let values_str = values_str.unwrap_or(&content[colon_pos + 1..]);
 
                 fields.push(field.to_string());
 
@@ -521,8 +587,8 @@ fn decode_columnar_array(
                     vec![]
                 } else {
                     split_column_values(values_str, delimiter)
-                        .iter()
-                        .map(|s| parse_columnar_cell(s))
+                        .into_iter()
+                        .map(parse_columnar_cell)
                         .collect()
                 };
                 columns.push(values);
@@ -537,22 +603,19 @@ fn decode_columnar_array(
         }
     }
 
-    // Transpose columns to rows, preserving field order
-    let mut result: Vec<Value> = Vec::with_capacity(count);
-    for i in 0..count {
-        let mut obj = Map::new();
-        for (j, field) in fields.iter().enumerate() {
-            if let Some(col) = columns.get(j) {
-                // Only insert if value is present (Some(Some(val))), skip if missing
-                if let Some(Some(val)) = col.get(i) {
-                    obj.insert(field.clone(), val.clone());
-                }
+    // Transpose columns to rows by moving each present cell into its row.
+    // Visiting columns in field order preserves key order within each row;
+    // missing cells (None) are skipped without any per-cell lookups.
+    let mut rows: Vec<Map<String, Value>> = (0..count).map(|_| Map::new()).collect();
+    for (field, column) in fields.iter().zip(columns) {
+        for (obj, cell) in rows.iter_mut().zip(column) {
+            if let Some(val) = cell {
+                obj.insert(field.clone(), val);
             }
         }
-        result.push(Value::Object(obj));
     }
 
-    let arr = Value::Array(result);
+    let arr = Value::Array(rows.into_iter().map(Value::Object).collect());
     if name.is_empty() {
         Ok((arr, idx))
     } else {
@@ -562,59 +625,35 @@ fn decode_columnar_array(
     }
 }
 
-/// Split column values respecting quotes
-fn split_column_values(values_str: &str, delimiter: &str) -> Vec<String> {
+/// Split column values on unquoted delimiters, returning slices of `values_str`
+///
+/// Scans bytes like the rows splitter: quotes, backslashes and the
+/// delimiter's first byte never occur inside a multi-byte UTF-8 sequence.
+fn split_column_values<'a>(values_str: &'a str, delimiter: &str) -> Vec<&'a str> {
+    let bytes = values_str.as_bytes();
+    let delim = delimiter.as_bytes();
     let mut result = Vec::new();
-    let mut current = String::new();
+    let mut start = 0;
     let mut in_quote = false;
-    let mut chars = values_str.chars().peekable();
-    let delim_chars: Vec<char> = delimiter.chars().collect();
-
-    while let Some(c) = chars.next() {
-        // Check for delimiter (only when not in quotes)
-        if !in_quote && c == delim_chars[0] {
-            let mut is_delim = delim_chars.len() == 1;
-            if delim_chars.len() > 1 {
-                // Check rest of delimiter
-                let mut temp = String::new();
-                temp.push(c);
-                let mut matched = true;
-                for (_i, &dc) in delim_chars.iter().enumerate().skip(1) {
-                    if let Some(&nc) = chars.peek() {
-                        if nc == dc {
-                            temp.push(chars.next().unwrap());
-                        } else {
-                            matched = false;
-                            current.push_str(&temp);
-                            break;
-                        }
-                    } else {
-                        matched = false;
-                        current.push_str(&temp);
-                        break;
-                    }
-                }
-                is_delim = matched;
-            }
-            if is_delim {
-                result.push(current);
-                current = String::new();
+    let mut i = 0;
+
+    while i < bytes.len() {
+        match bytes[i] {
+            // Skip the escaped byte so `\"` does not end the quoted cell
+            b'\\' if in_quote => i += 1,
+            b'"' => in_quote = !in_quote,
+            _ if !in_quote && !delim.is_empty() && bytes[i..].starts_with(delim) => {
+                result.push(&values_str[start..i]);
+                i += delim.len();
+                start = i;
                 continue;
             }
+            _ => {}
         }
-
-        if c == '"' && !in_quote {
-            in_quote = true;
-            current.push(c);
-        } else if c == '"' && in_quote {
-            in_quote = false;
-            current.push(c);
-        } else {
-            current.push(c);
-        }
+        i += 1;
     }
 
-    result.push(current);
+    result.push(&values_str[start..]);
     result
 }
 
@@ -896,6 +935,25 @@ mod tests {
         assert!(encoded.contains("├") || encoded.contains("└"));
     }
 
+    #[test]
+    fn test_encode_columnar_truncates_trailing_missing_cells() {
+        let data = json!([
+            {"id": 1, "email": "a@x.io", "note": null},
+            {"id": 2, "email": "b@x.io"},
+            {"id": 3}
+        ]);
+        let encoded = encode(&data, false).unwrap();
+        assert_eq!(
+            encoded,
+            "[3]\n├ id: 1\t2\t3\n├ email: a@x.io\tb@x.io\n└ note: null"
+        );
+        // Explicit null stays present; truncated cells decode as missing
+        assert_eq!(
+            decode(&format!("@AGON columns\n\n{}", encoded)).unwrap(),
+            data
+        );
+    }
+
     #[test]
     fn test_encode_with_header() {
         let data = json!({"name": "test"});
@@ -1179,6 +1237,28 @@ mod tests {
             parse_primitive("\"line\\nbreak\""),
             Value::String("line\nbreak".to_string())
         );
+        // An escaped backslash followed by 'n' is not a newline
+        assert_eq!(
+            parse_primitive("\"a\\\\nb\\tc\""),
+            Value::String("a\\nb\tc".to_string())
+        );
+    }
+
+    #[test]
+    fn test_quote_string_roundtrip() {
+        for s in [
+            "a\\b",
+            "a\\nb",
+            "say \"hi\"",
+            "tab\there",
+            "line\nbreak",
+            "\\",
+        ] {
+            assert_eq!(
+                parse_primitive(&quote_string(s)),
+                Value::String(s.to_string())
+            );
+        }
     }
 
     #[test]
@@ -1212,8 +1292,8 @@ mod tests {
         let arr = vec![json!({"id": 1, "name": "a"}), json!({"id": 2, "name": "b"})];
         let (uniform, fields) = is_uniform_array(&arr);
         assert!(uniform);
-        assert!(fields.contains(&"id".to_string()));
-        assert!(fields.contains(&"name".to_string()));
+        assert!(fields.contains(&"id"));
+        assert!(fields.contains(&"name"));
     }
 
     #[test]
@@ -1241,6 +1321,27 @@ mod tests {
         assert_eq!(values, vec!["a", "", "c"]);
     }
 
+    #[test]
+    fn test_split_column_values_escaped_quote() {
+        let values = split_column_values("\"x\\\"y\"\tz", "\t");
+        assert_eq!(values, vec!["\"x\\\"y\"", "z"]);
+    }
+
+    #[test]
+    fn test_roundtrip_escaped_quote_before_later_cells() {
+        let data = json!([{"a": "x\"y"}, {"a": "z"}]);
+        let encoded = encode(&data, true).unwrap();
+        assert_eq!(decode(&encoded).unwrap(), data);
+    }
+
+    #[test]
+    fn test_roundtrip_missing_leading_cell() {
+        let data = json!([{"a": 1}, {"a": 2, "b": "y"}, {"b": "z"}]);
+        let encoded = encode(&data, true).unwrap();
+        assert!(encoded.contains("└ b: \ty\tz"));
+        assert_eq!(decode(&encoded).unwrap(), data);
+    }
+
     #[test]
     fn test_get_indent_depth() {
         assert_eq!(get_indent_depth("no indent"), 0);
@@ -1294,6 +1395,18 @@ mod tests {
         assert!(arr[1].get("email").is_none() || arr[1]["email"].is_null());
     }
 
+    #[test]
+    fn test_reordered_keys_in_column() {
+        // Rows with a different key order still land in the right columns
+        let data = json!([
+            {"id": 1, "name": "Alice"},
+            {"name": "Bob", "id": 2}
+        ]);
+        let encoded = encode(&data, false).unwrap();
+        assert!(encoded.contains("├ id: 1\t2"));
+        assert!(encoded.contains("└ name: Alice\tBob"));
+    }
+
     #[test]
     fn test_list_array_with_objects() {
         let data = json!({
@@ -13,7 +13,7 @@ use rayon::prelude::*;
 use serde_json::Value as JsonValue;
 
 use crate::error::Result;
-use crate::utils::count_tokens;
+use crate::utils::{count_tokens, count_tokens_batch};
 
 /// Result of encoding with metadata
 #[derive(Debug, Clone)]
@@ -40,6 +40,29 @@ fn count_tokens_for_comparison(text: &str, encoding: Option<&str>) -> usize {
     }
 }
 
+/// Candidate format: (name, header, headerless encoder)
+type FormatEntry = (&'static str, &'static str, fn(&JsonValue) -> Result<String>);
+
+/// Candidate formats in tie-break order, so auto-select iterates a fixed
+/// table instead of matching on format names per candidate
+const FORMATS: [FormatEntry; 4] = [
+    ("json", "", |data| Ok(serde_json::to_string(data)?)),
+    ("rows", "@AGON rows", |data| rows::encode(data, false)),
+    ("columns", "@AGON columns", |data| {
+        columns::encode(data, false)
+    }),
+    ("struct", "@AGON struct", |data| {
+        struct_fmt::encode(data, false)
+    }),
+];
+
+/// Non-JSON candidates that get exact token counts when auto-selecting
+const TOKENIZED_FINALISTS: usize = 2;
+
+/// Byte lead over the runner-up at which the shortest candidate wins without
+/// tokenizing the others (JSON is still tokenized for the savings check)
+const CLEAR_LEAD_MARGIN: f64 = 0.10;
+
 /// Headers for each format
 pub fn get_header(format: &str) -> &'static str {
     match format {
@@ -58,34 +81,69 @@ pub fn encode_auto_parallel(
     min_savings: f64,
     encoding: Option<&str>,
 ) -> Result<EncodingResult> {
-    let results = encode_all_parallel_internal(data, encoding)?;
+    let mut results = encode_all_parallel_internal(data, None)?;
+
+    // Byte length tracks token count closely for these compact formats, so
+    // only the JSON baseline and the shortest AGON candidates are tokenized
+    if let Some(enc) = encoding {
+        results = shortlist_by_bytes(results, TOKENIZED_FINALISTS);
+        results = drop_clear_losers(results, CLEAR_LEAD_MARGIN);
+        if !force {
+            results = drop_unlikely_savings(results, min_savings);
+        }
+        // Even when only JSON is left, count it: the winner's token_estimate
+        // is reported to callers and must be exact once a tokenizer is given
+        count_candidate_tokens(&mut results, enc);
+    }
 
-    // Find JSON baseline
-    let json_result = results.iter().find(|r| r.format == "json");
-    let json_tokens = json_result.map(|r| r.token_estimate).unwrap_or(usize::MAX);
+    // Without a tokenizer, compare exact byte lengths: the ~4 bytes/token
+    // estimate is a constant ratio, so truncating it only loses precision
+    let score = |r: &EncodingResult| match encoding {
+        Some(_) => r.token_estimate,
+        None => r.text.len(),
+    };
 
-    // Find best result (exclude JSON if force=true)
-    let best = results
-        .iter()
-        .filter(|r| !force || r.format != "json")
-        .min_by_key(|r| r.token_estimate);
+    // Single pass: JSON baseline plus best candidate (exclude JSON if force=true);
+    // strict `<` keeps the first of equal scores, matching table order
+    let mut json: Option<(usize, usize)> = None;
+    let mut best: Option<(usize, usize)> = None;
+    for (idx, result) in results.iter().enumerate() {
+        let candidate_score = score(result);
+        let is_json = result.format == "json";
+        if is_json && json.is_none() {
+            json = Some((idx, candidate_score));
+        }
+        if force && is_json {
+            continue;
+        }
+        if best.is_none_or(|(_, best_score)| candidate_score < best_score) {
+            best = Some((idx, candidate_score));
+        }
+    }
 
     match best {
-        Some(best_result) => {
+        Some((best_idx, best_score)) => {
             // Check if savings meet threshold
-            if !force && best_result.format != "json" {
-                let savings = 1.0 - (best_result.token_estimate as f64 / json_tokens.max(1) as f64);
+            if !force && results[best_idx].format != "json" {
+                let json_score = json.map_or(usize::MAX, |(_, s)| s);
+                let savings = 1.0 - (best_score as f64 / json_score.max(1) as f64);
                 if savings < min_savings {
                     // Return JSON if savings don't meet threshold
-                    return Ok(json_result.cloned().unwrap_or_else(|| EncodingResult {
-                        format: "json".to_string(),
-                        text: serde_json::to_string(data).unwrap_or_default(),
-                        header: String::new(),
-                        token_estimate: json_tokens,
-                    }));
+                    return Ok(match json {
+                        Some((json_idx, _)) => results.swap_remove(json_idx),
+                        None => {
+                            let text = serde_json::to_string(data).unwrap_or_default();
+                            EncodingResult {
+                                format: "json".to_string(),
+                                token_estimate: estimate_tokens_fast(&text),
+                                text,
+                                header: String::new(),
+                            }
+                        }
+                    });
                 }
             }
-            Ok(best_result.clone())
+            Ok(results.swap_remove(best_idx))
         }
         None => {
             // Fallback to JSON
@@ -111,12 +169,10 @@ fn encode_all_parallel_internal(
     data: &JsonValue,
     encoding: Option<&str>,
 ) -> Result<Vec<EncodingResult>> {
-    let formats = ["json", "rows", "columns", "struct"];
-
-    // Use rayon to encode all formats in parallel
-    let results: Vec<Result<EncodingResult>> = formats
+    // Use rayon to encode all formats in parallel; tokens are counted afterwards
+    let results: Vec<Result<EncodingResult>> = FORMATS
         .par_iter()
-        .map(|format| encode_with_format(data, format, encoding))
+        .map(|entry| encode_entry(data, entry, None))
         .collect();
 
     // Collect results, filtering out errors
@@ -128,6 +184,10 @@ fn encode_all_parallel_internal(
         }
     }
 
+    if let Some(enc) = encoding {
+        count_candidate_tokens(&mut valid_results, enc);
+    }
+
     if valid_results.is_empty() {
         // At minimum, JSON should always work
         let text = serde_json::to_string(data)?;
@@ -142,32 +202,114 @@ fn encode_all_parallel_internal(
     Ok(valid_results)
 }
 
-/// Encode data with a specific format
+/// Replace byte estimates with exact token counts, using a single tokenizer lookup
+fn count_candidate_tokens(results: &mut [EncodingResult], encoding: &str) {
+    let texts: Vec<&str> = results.iter().map(|r| r.text.as_str()).collect();
+    if let Ok(counts) = count_tokens_batch(&texts, encoding) {
+        for (result, tokens) in results.iter_mut().zip(counts) {
+            result.token_estimate = tokens;
+        }
+    }
+}
+
+/// Keep the JSON baseline plus the `finalists` shortest non-JSON candidates
+///
+/// Candidates keep their original order, so ties still resolve the same way.
+fn shortlist_by_bytes(results: Vec<EncodingResult>, finalists: usize) -> Vec<EncodingResult> {
+    let mut lens: Vec<usize> = results
+        .iter()
+        .filter(|r| r.format != "json")
+        .map(|r| r.text.len())
+        .collect();
+    if finalists == 0 || lens.len() <= finalists {
+        return results;
+    }
+    lens.sort_unstable();
+    let cutoff = lens[finalists - 1];
+
+    let mut kept = 0;
+    results
+        .into_iter()
+        .filter(|r| {
+            if r.format == "json" {
+                return true;
+            }
+            let keep = kept < finalists && r.text.len() <= cutoff;
+            kept += usize::from(keep);
+            keep
+        })
+        .collect()
+}
+
+/// Drop non-JSON candidates more than `margin` longer in bytes than the shortest
+///
+/// Only close calls between AGON formats need exact token counts to decide;
+/// a clear byte leader is taken to win on tokens too (the same heuristic as
+/// `shortlist_by_bytes`), so the rest are not tokenized.
+fn drop_clear_losers(results: Vec<EncodingResult>, margin: f64) -> Vec<EncodingResult> {
+    let Some(shortest) = results
+        .iter()
+        .filter(|r| r.format != "json")
+        .map(|r| r.text.len())
+        .min()
+    else {
+        return results;
+    };
+    let limit = shortest as f64 * (1.0 + margin);
+    results
+        .into_iter()
+        .filter(|r| r.format == "json" || r.text.len() as f64 <= limit)
+        .collect()
+}
+
+/// Drop non-JSON candidates whose byte length is too close to JSON's to reach
+/// `min_savings` in tokens
+///
+/// Heuristic: the compact formats have a near-uniform bytes-per-token ratio,
+/// so a candidate that saves less than half the required ratio in bytes is
+/// not worth tokenizing.
+fn drop_unlikely_savings(results: Vec<EncodingResult>, min_savings: f64) -> Vec<EncodingResult> {
+    let Some(json_bytes) = results
+        .iter()
+        .find(|r| r.format == "json")
+        .map(|r| r.text.len())
+    else {
+        return results;
+    };
+    let limit = json_bytes as f64 * (1.0 - min_savings * 0.5);
+    results
+        .into_iter()
+        .filter(|r| r.format == "json" || r.text.len() as f64 <= limit)
+        .collect()
+}
+
+/// Encode data with a format looked up by name
+#[cfg(test)]
 fn encode_with_format(
     data: &JsonValue,
     format: &str,
     encoding: Option<&str>,
 ) -> Result<EncodingResult> {
-    let (text, header) = match format {
-        "json" => (serde_json::to_string(data)?, String::new()),
-        "rows" => (rows::encode(data, false)?, get_header("rows").to_string()),
-        "columns" => (
-            columns::encode(data, false)?,
-            get_header("columns").to_string(),
-        ),
-        "struct" => (
-            struct_fmt::encode(data, false)?,
-            get_header("struct").to_string(),
-        ),
-        _ => return Err(crate::error::AgonError::InvalidFormat(format.to_string())),
-    };
+    let entry = FORMATS
+        .iter()
+        .find(|(name, _, _)| *name == format)
+        .ok_or_else(|| crate::error::AgonError::InvalidFormat(format.to_string()))?;
+    encode_entry(data, entry, encoding)
+}
 
+/// Run one format table entry and wrap its output
+fn encode_entry(
+    data: &JsonValue,
+    (name, header, encode): &FormatEntry,
+    encoding: Option<&str>,
+) -> Result<EncodingResult> {
+    let text = encode(data)?;
     let token_estimate = count_tokens_for_comparison(&text, encoding);
 
     Ok(EncodingResult {
-        format: format.to_string(),
+        format: name.to_string(),
         text,
-        header,
+        header: header.to_string(),
         token_estimate,
     })
 }
@@ -255,6 +397,17 @@ mod tests {
         assert!(!result.text.is_empty());
     }
 
+    #[test]
+    fn test_encode_auto_parallel_compares_exact_bytes() {
+        // 15 vs 12 bytes: both round down to 3 estimated tokens, but the
+        // shorter encoding still has to win on an exact comparison
+        let data = json!({"abcdefghi": 1});
+        let json_len = serde_json::to_string(&data).unwrap().len();
+        let result = encode_auto_parallel(&data, false, 0.0, None).unwrap();
+        assert!(result.text.len() <= json_len);
+        assert_ne!(result.format, "json");
+    }
+
     #[test]
     fn test_encode_with_format_json() {
         let data = json!({"key": "value"});
@@ -319,6 +472,118 @@ mod tests {
         }
     }
 
+    #[test]
+    fn test_encode_all_parallel_with_encoding_counts_tokens() {
+        let data = json!([
+            {"id": 1, "name": "Alice"},
+            {"id": 2, "name": "Bob"}
+        ]);
+
+        let results = encode_all_parallel_internal(&data, Some("o200k_base")).unwrap();
+
+        for result in &results {
+            assert_eq!(
+                result.token_estimate,
+                count_tokens(&result.text, "o200k_base").unwrap()
+            );
+        }
+    }
+
+    #[test]
+    fn test_shortlist_by_bytes_keeps_json_and_shortest() {
+        let candidate = |format: &str, text: &str| EncodingResult {
+            format: format.to_string(),
+            text: text.to_string(),
+            header: String::new(),
+            token_estimate: 0,
+        };
+        let results = vec![
+            candidate("json", "jjjjjjjjjj"),
+            candidate("rows", "rrrr"),
+            candidate("columns", "cccccc"),
+            candidate("struct", "ssss"),
+        ];
+
+        let kept = shortlist_by_bytes(results, 2);
+        let formats: Vec<&str> = kept.iter().map(|r| r.format.as_str()).collect();
+        assert_eq!(formats, ["json", "rows", "struct"]);
+    }
+
+    #[test]
+    fn test_drop_unlikely_savings() {
+        let candidate = |format: &str, len: usize| EncodingResult {
+            format: format.to_string(),
+            text: "x".repeat(len),
+            header: String::new(),
+            token_estimate: 0,
+        };
+        let results = vec![
+            candidate("json", 100),
+            candidate("rows", 96),
+            candidate("columns", 95),
+            candidate("struct", 60),
+        ];
+
+        let kept = drop_unlikely_savings(results, 0.10);
+        let formats: Vec<&str> = kept.iter().map(|r| r.format.as_str()).collect();
+        assert_eq!(formats, ["json", "columns", "struct"]);
+    }
+
+    #[test]
+    fn test_drop_clear_losers() {
+        let candidate = |format: &str, len: usize| EncodingResult {
+            format: format.to_string(),
+            text: "x".repeat(len),
+            header: String::new(),
+            token_estimate: 0,
+        };
+        let results = vec![
+            candidate("json", 200),
+            candidate("rows", 50),
+            candidate("columns", 55),
+            candidate("struct", 56),
+        ];
+
+        let kept = drop_clear_losers(results, 0.10);
+        let formats: Vec<&str> = kept.iter().map(|r| r.format.as_str()).collect();
+        assert_eq!(formats, ["json", "rows", "columns"]);
+    }
+
+    #[test]
+    fn test_encode_auto_parallel_with_encoding_skips_hopeless_candidates() {
+        let data = json!({"a": 1});
+
+        let result = encode_auto_parallel(&data, false, 0.5, Some("o200k_base")).unwrap();
+        assert_eq!(result.format, "json");
+        assert_eq!(
+            result.token_estimate,
+            count_tokens(&result.text, "o200k_base").unwrap()
+        );
+
+        // force still tokenizes and returns a non-JSON format
+        let forced = encode_auto_parallel(&data, true, 0.5, Some("o200k_base")).unwrap();
+        assert_ne!(forced.format, "json");
+        assert_eq!(
+            forced.token_estimate,
+            count_tokens(&forced.text, "o200k_base").unwrap()
+        );
+    }
+
+    #[test]
+    fn test_encode_auto_parallel_with_encoding_uses_exact_counts() {
+        let data = json!([
+            {"id": 1, "name": "Alice", "role": "admin"},
+            {"id": 2, "name": "Bob", "role": "user"},
+            {"id": 3, "name": "Carol", "role": "user"}
+        ]);
+
+        let result = encode_auto_parallel(&data, false, 0.0, Some("o200k_base")).unwrap();
+        assert_eq!(
+            result.token_estimate,
+            count_tokens(&result.text, "o200k_base").unwrap()
+        );
+    }
+
     #[test]
     fn test_empty_object() {
         let data = json!({});
@@ -9,13 +9,15 @@
 
 use regex::Regex;
 use serde_json::{Map, Value};
+use std::collections::HashSet;
+use std::fmt::{self, Write};
 use std::sync::LazyLock;
 
 use crate::error::{AgonError, Result};
+use crate::utils::{self, LineWriter};
 
 const HEADER: &str = "@AGON rows";
 const DEFAULT_DELIMITER: &str = "\t";
-const INDENT: &str = "  ";
 
 // Regex patterns for parsing
 static TABULAR_HEADER_RE: LazyLock<Regex> =
@@ -24,22 +26,20 @@ static PRIMITIVE_ARRAY_RE: LazyLock<Regex> =
     LazyLock::new(|| Regex::new(r"^(\w*)\[(\d+)\]:\s*(.*)$").unwrap());
 static LIST_ARRAY_RE: LazyLock<Regex> = LazyLock::new(|| Regex::new(r"^(\w*)\[(\d+)\]:$").unwrap());
 static KEY_VALUE_RE: LazyLock<Regex> = LazyLock::new(|| Regex::new(r"^([^:]+):\s*(.*)$").unwrap());
-static NUMBER_RE: LazyLock<Regex> =
-    LazyLock::new(|| Regex::new(r"^-?(?:0|[1-9]\d*)(?:\.\d+)?(?:[eE][+-]?\d+)?$").unwrap());
 
 /// Encode data to AGONRows format
 pub fn encode(data: &Value, include_header: bool) -> Result<String> {
-    let mut lines = Vec::new();
+    let mut lines = LineWriter::new();
     let delimiter = DEFAULT_DELIMITER;
 
     if include_header {
-        lines.push(HEADER.to_string());
-        lines.push(String::new());
+        lines.push(HEADER);
+        lines.push("");
     }
 
     encode_value(data, &mut lines, 0, delimiter, None);
 
-    Ok(lines.join("\n"))
+    Ok(lines.into_string())
 }
 
 /// Decode AGONRows payload
@@ -94,31 +94,50 @@ fn needs_quote(s: &str, delimiter: &str) -> bool {
     if s.trim() != s {
         return true;
     }
-    if s.contains(delimiter) {
+    // One byte pass for the delimiter and escapes; all are ASCII, so no
+    // UTF-8 continuation byte can match
+    let special = |b: u8| matches!(b, b'\n' | b'\r' | b'\\' | b'"');
+    let has_special = match delimiter.as_bytes() {
+        &[d] => s.bytes().any(|b| b == d || special(b)),
+        _ => s.contains(delimiter) || s.bytes().any(special),
+    };
+    if has_special {
         return true;
     }
-    if s.contains('\n') || s.contains('\r') || s.contains('\\') || s.contains('"') {
+    if matches!(s.as_bytes()[0], b'@' | b'#' | b'-') {
         return true;
     }
-    let first = s.chars().next().unwrap();
-    if first == '@' || first == '#' || first == '-' {
+    if ["true", "false", "null"]
+        .iter()
+        .any(|kw| s.eq_ignore_ascii_case(kw))
+    {
         return true;
     }
-    let lower = s.to_lowercase();
-    if lower == "true" || lower == "false" || lower == "null" {
-        return true;
-    }
-    NUMBER_RE.is_match(s)
+    utils::scan_number(s).is_some()
 }
 
+#[cfg(test)]
 fn quote_string(s: &str) -> String {
-    let escaped = s
-        .replace('\\', "\\\\")
-        .replace('"', "\\\"")
-        .replace('\n', "\\n")
-        .replace('\r', "\\r")
-        .replace('\t', "\\t");
-    format!("\"{}\"", escaped)
+    let mut out = String::new();
+    push_quoted(&mut out, s);
+    out
+}
+
+/// Append `s` quoted and escaped to `out`, in a single pass
+fn push_quoted(out: &mut String, s: &str) {
+    out.reserve(s.len() + 2);
+    out.push('"');
+    for c in s.chars() {
+        match c {
+            '\\' => out.push_str("\\\\"),
+            '"' => out.push_str("\\\""),
+            '\n' => out.push_str("\\n"),
+            '\r' => out.push_str("\\r"),
+            '\t' => out.push_str("\\t"),
+            _ => out.push(c),
+        }
+    }
+    out.push('"');
 }
 
 fn unquote_string(s: &str) -> String {
@@ -147,22 +166,33 @@ fn unquote_string(s: &str) -> String {
     result
 }
 
-fn encode_primitive(val: &Value, delimiter: &str) -> String {
+/// Append an encoded primitive to `out` (no per-cell String for table rows)
+fn write_primitive(out: &mut String, val: &Value, delimiter: &str) {
     match val {
-        Value::Null => "null".to_string(),
-        Value::Bool(b) => if *b { "true" } else { "false" }.to_string(),
-        Value::Number(n) => n.to_string(),
+        Value::Null => out.push_str("null"),
+        Value::Bool(b) => out.push_str(if *b { "true" } else { "false" }),
+        Value::Number(n) => {
+            let _ = write!(out, "{}", n);
+        }
         Value::String(s) => {
             if needs_quote(s, delimiter) {
-                quote_string(s)
+                push_quoted(out, s);
             } else {
-                s.clone()
+                out.push_str(s);
             }
         }
-        _ => serde_json::to_string(val).unwrap_or_default(),
+        _ => out.push_str(&serde_json::to_string(val).unwrap_or_default()),
     }
 }
 
+/// Append a line of `prefix` followed by an encoded primitive
+fn push_field(lines: &mut LineWriter, prefix: fmt::Arguments<'_>, val: &Value, delimiter: &str) {
+    let line = lines.line();
+    // Writing into a String cannot fail
+    let _ = line.write_fmt(prefix);
+    write_primitive(line, val, delimiter);
+}
+
 fn parse_primitive(s: &str) -> Value {
     let s = s.trim();
     if s.is_empty() {
@@ -187,16 +217,20 @@ fn parse_primitive(s: &str) -> Value {
     }
 
     // Number
-    if NUMBER_RE.is_match(s) {
-        if s.contains('.') || s.to_lowercase().contains('e') {
+    match utils::scan_number(s) {
+        Some(true) => {
+            if let Ok(i) = s.parse::<i64>() {
+                return Value::Number(i.into());
+            }
+        }
+        Some(false) => {
             if let Ok(f) = s.parse::<f64>()
                 && let Some(n) = serde_json::Number::from_f64(f)
             {
                 return Value::Number(n);
             }
-        } else if let Ok(i) = s.parse::<i64>() {
-            return Value::Number(i.into());
         }
+        None => {}
     }
 
     Value::String(s.to_string())
@@ -211,35 +245,26 @@ fn parse_delimiter(d: &str) -> String {
     }
 }
 
-fn is_uniform_array(arr: &[Value]) -> (bool, Vec<String>) {
+fn is_uniform_array(arr: &[Value]) -> (bool, Vec<&str>) {
     if arr.is_empty() {
         return (false, vec![]);
     }
 
-    // Check all are objects
-    if !arr.iter().all(|v| v.is_object()) {
-        return (false, vec![]);
-    }
-
-    // Check all values are primitives
-    for obj in arr {
-        if let Some(map) = obj.as_object() {
-            for v in map.values() {
-                if v.is_object() || v.is_array() {
-                    return (false, vec![]);
-                }
-            }
-        }
-    }
-
-    // Collect keys in order
+    // Single pass: every item must be an object of primitives, and keys are
+    // collected in first-seen order along the way (set keeps lookups O(1)).
+    // Keys are borrowed from the input; nothing is copied per field.
+    let mut seen = HashSet::new();
     let mut key_order = Vec::new();
     for obj in arr {
-        if let Some(map) = obj.as_object() {
-            for k in map.keys() {
-                if !key_order.contains(k) {
-                    key_order.push(k.clone());
-                }
+        let Some(map) = obj.as_object() else {
+            return (false, vec![]);
+        };
+        for (k, v) in map {
+            if v.is_object() || v.is_array() {
+                return (false, vec![]);
+            }
+            if seen.insert(k.as_str()) {
+                key_order.push(k.as_str());
             }
         }
     }
@@ -253,20 +278,19 @@ fn is_primitive_array(arr: &[Value]) -> bool {
 
 fn encode_value(
     val: &Value,
-    lines: &mut Vec<String>,
+    lines: &mut LineWriter,
     depth: usize,
     delimiter: &str,
     name: Option<&str>,
 ) {
-    let indent = INDENT.repeat(depth);
+    let indent = utils::indent(depth);
 
     match val {
         Value::Null | Value::Bool(_) | Value::Number(_) | Value::String(_) => {
-            let encoded = encode_primitive(val, delimiter);
             if let Some(n) = name {
-                lines.push(format!("{}{}: {}", indent, n, encoded));
+                push_field(lines, format_args!("{}{}: ", indent, n), val, delimiter);
             } else {
-                lines.push(format!("{}{}", indent, encoded));
+                push_field(lines, format_args!("{}", indent), val, delimiter);
             }
         }
         Value::Array(arr) => {
@@ -280,18 +304,18 @@ fn encode_value(
 
 fn encode_array(
     arr: &[Value],
-    lines: &mut Vec<String>,
+    lines: &mut LineWriter,
     depth: usize,
     delimiter: &str,
     name: Option<&str>,
 ) {
-    let indent = INDENT.repeat(depth);
+    let indent = utils::indent(depth);
 
     if arr.is_empty() {
         if let Some(n) = name {
-            lines.push(format!("{}{}[0]:", indent, n));
+            lines.push_fmt(format_args!("{}{}[0]:", indent, n));
         } else {
-            lines.push(format!("{}[0]:", indent));
+            lines.push_fmt(format_args!("{}[0]:", indent));
         }
         return;
     }
@@ -301,113 +325,111 @@ fn encode_array(
     if is_uniform && !fields.is_empty() {
         let header = fields.join(delimiter);
         if let Some(n) = name {
-            lines.push(format!("{}{}[{}]{{{}}}", indent, n, arr.len(), header));
+            lines.push_fmt(format_args!("{}{}[{}]{{{}}}", indent, n, arr.len(), header));
         } else {
-            lines.push(format!("{}[{}]{{{}}}", indent, arr.len(), header));
+            lines.push_fmt(format_args!("{}[{}]{{{}}}", indent, arr.len(), header));
         }
 
-        for obj in arr {
-            if let Some(map) = obj.as_object() {
-                let row: Vec<String> = fields
-                    .iter()
-                    .map(|f| {
-                        map.get(f)
-                            .map(|v| encode_primitive(v, delimiter))
-                            .unwrap_or_default()
-                    })
-                    .collect();
-                lines.push(format!("{}{}", indent, row.join(delimiter)));
+        // Write each row's cells directly into its line. Trailing missing
+        // cells are dropped by cutting back to the end of the last present one
+        // (the decoder already treats absent trailing cells as missing).
+        for map in arr.iter().filter_map(Value::as_object) {
+            // Rows whose keys match the header in order (the common case for
+            // homogeneous records) take their values positionally, skipping
+            // a hashed lookup per cell
+            let positional =
+                map.len() == fields.len() && map.keys().zip(&fields).all(|(k, f)| k == f);
+            let mut values = map.values();
+            let line = lines.line();
+            line.push_str(&indent);
+            let mut end = line.len();
+            for (i, f) in fields.iter().enumerate() {
+                if i > 0 {
+                    line.push_str(delimiter);
+                }
+                let value = if positional {
+                    values.next()
+                } else {
+                    map.get(*f)
+                };
+                if let Some(v) = value {
+                    write_primitive(line, v, delimiter);
+                    end = line.len();
+                }
             }
+            line.truncate(end);
         }
         return;
     }
 
     // Primitive array (inline format)
     if is_primitive_array(arr) {
-        let values: Vec<String> = arr.iter().map(|v| encode_primitive(v, delimiter)).collect();
-        if let Some(n) = name {
-            lines.push(format!(
-                "{}{}[{}]: {}",
-                indent,
-                n,
-                arr.len(),
-                values.join(delimiter)
-            ));
-        } else {
-            lines.push(format!(
-                "{}[{}]: {}",
-                indent,
-                arr.len(),
-                values.join(delimiter)
-            ));
+        let line = lines.line();
+        // Writing into a String cannot fail
+        let _ = match name {
+            Some(n) => write!(line, "{}{}[{}]: ", indent, n, arr.len()),
+            None => write!(line, "{}[{}]: ", indent, arr.len()),
+        };
+        for (i, v) in arr.iter().enumerate() {
+            if i > 0 {
+                line.push_str(delimiter);
+            }
+            write_primitive(line, v, delimiter);
         }
         return;
     }
 
     // Mixed/nested array
     if let Some(n) = name {
-        lines.push(format!("{}{}[{}]:", indent, n, arr.len()));
+        lines.push_fmt(format_args!("{}{}[{}]:", indent, n, arr.len()));
     } else {
-        lines.push(format!("{}[{}]:", indent, arr.len()));
+        lines.push_fmt(format_args!("{}[{}]:", indent, arr.len()));
     }
 
     for item in arr {
         if item.is_object() {
             encode_list_item_object(item.as_object().unwrap(), lines, depth + 1, delimiter);
         } else {
-            lines.push(format!(
-                "{}  - {}",
-                indent,
-                encode_primitive(item, delimiter)
-            ));
+            push_field(lines, format_args!("{}  - ", indent), item, delimiter);
         }
     }
 }
 
 fn encode_list_item_object(
     obj: &Map<String, Value>,
-    lines: &mut Vec<String>,
+    lines: &mut LineWriter,
     depth: usize,
     delimiter: &str,
 ) {
-    let indent = INDENT.repeat(depth);
+    let indent = utils::indent(depth);
     let mut first = true;
 
     for (k, v) in obj {
-        let prefix = if first {
-            format!("{}- ", indent)
-        } else {
-            format!("{}  ", indent)
-        };
+        let marker = if first { "- " } else { "  " };
         first = false;
 
         match v {
             Value::Object(nested) => {
-                lines.push(format!("{}{}:", prefix, k));
+                lines.push_fmt(format_args!("{}{}{}:", indent, marker, k));
                 for (nk, nv) in nested {
                     if nv.is_object() || nv.is_array() {
                         encode_value(nv, lines, depth + 2, delimiter, Some(nk));
                     } else {
-                        lines.push(format!(
-                            "{}    {}: {}",
-                            indent,
-                            nk,
-                            encode_primitive(nv, delimiter)
-                        ));
+                        push_field(lines, format_args!("{}    {}: ", indent, nk), nv, delimiter);
                     }
                 }
             }
             Value::Array(_) => {
-                lines.push(format!("{}{}:", prefix, k));
+                lines.push_fmt(format_args!("{}{}{}:", indent, marker, k));
                 encode_value(v, lines, depth + 2, delimiter, None);
             }
             _ => {
-                lines.push(format!(
-                    "{}{}: {}",
-                    prefix,
-                    k,
-                    encode_primitive(v, delimiter)
-                ));
+                push_field(
+                    lines,
+                    format_args!("{}{}{}: ", indent, marker, k),
+                    v,
+                    delimiter,
+                );
             }
         }
     }
@@ -415,20 +437,20 @@ fn encode_list_item_object(
 
 fn encode_object(
     obj: &Map<String, Value>,
-    lines: &mut Vec<String>,
+    lines: &mut LineWriter,
     depth: usize,
     delimiter: &str,
     name: Option<&str>,
 ) {
-    let indent = INDENT.repeat(depth);
+    let indent = utils::indent(depth);
     let mut actual_depth = depth;
 
     if let Some(n) = name {
-        lines.push(format!("{}{}:", indent, n));
+        lines.push_fmt(format_args!("{}{}:", indent, n));
         actual_depth += 1;
     }
 
-    let actual_indent = INDENT.repeat(actual_depth);
+    let actual_indent = utils::indent(actual_depth);
 
     for (k, v) in obj {
         match v {
@@ -436,12 +458,12 @@ fn encode_object(
                 encode_value(v, lines, actual_depth, delimiter, Some(k));
             }
             _ => {
-                lines.push(format!(
-                    "{}{}: {}",
-                    actual_indent,
-                    k,
-                    encode_primitive(v, delimiter)
-                ));
+                push_field(
+                    lines,
+                    format_args!("{}{}: ", actual_indent, k),
+                    v,
+                    delimiter,
+                );
             }
         }
     }
@@ -457,69 +479,37 @@ fn get_indent_depth(line: &str) -> usize {
     spaces / 2
 }
 
-fn split_row(values_str: &str, delimiter: &str) -> Vec<String> {
-    if delimiter.len() == 1 {
-        // Fast path for single-char delimiter (common case: tab)
-        let delim_char = delimiter.chars().next().unwrap();
-        let mut result = Vec::new();
-        let mut current = String::new();
-        let mut in_quote = false;
-        let mut escape_next = false;
-
-        for c in values_str.chars() {
-            if escape_next {
-                current.push(c);
-                escape_next = false;
-                continue;
-            }
-
-            if c == '\\' && in_quote {
-                escape_next = true;
-                current.push(c);
+/// Split a row on unquoted delimiters, returning slices of `values_str`
+///
+/// Scans bytes rather than chars: quotes, backslashes and the delimiter's
+/// first byte never occur inside a multi-byte UTF-8 sequence, so every split
+/// point lands on a char boundary.
+fn split_row<'a>(values_str: &'a str, delimiter: &str) -> Vec<&'a str> {
+    let bytes = values_str.as_bytes();
+    let delim = delimiter.as_bytes();
+    let mut result = Vec::new();
+    let mut start = 0;
+    let mut in_quote = false;
+    let mut i = 0;
+
+    while i < bytes.len() {
+        match bytes[i] {
+            // Skip the escaped byte so `\"` does not end the quoted cell
+            b'\\' if in_quote => i += 1,
+            b'"' => in_quote = !in_quote,
+            _ if !in_quote && !delim.is_empty() && bytes[i..].starts_with(delim) => {
+                result.push(&values_str[start..i]);
+                i += delim.len();
+                start = i;
                 continue;
             }
-
-            if c == '"' {
-                in_quote = !in_quote;
-                current.push(c);
-            } else if c == delim_char && !in_quote {
-                result.push(current);
-                current = String::new();
-            } else {
-                current.push(c);
-            }
-        }
-
-        result.push(current);
-        result
-    } else {
-        // Multi-char delimiter (less common)
-        let mut result = Vec::new();
-        let mut current = String::new();
-        let mut in_quote = false;
-        let mut i = 0;
-        let chars: Vec<char> = values_str.chars().collect();
-
-        while i < chars.len() {
-            let c = chars[i];
-
-            if c == '"' {
-                in_quote = !in_quote;
-                current.push(c);
-                i += 1;
-            } else if !in_quote && values_str[i..].starts_with(delimiter) {
-                result.push(current);
-                current = String::new();
-                i += delimiter.len();
-            } else {
-                current.push(c);
-                i += 1;
-            }
+            _ => {}
         }
-
-        result.push(current);
-        result
+        i += 1;
     }
+
+    result.push(&values_str[start..]);
+    result
 }
 
 fn decode_value(
@@ -543,8 +533,11 @@ fn decode_value(
         return decode_value(lines, idx + 1, depth, delimiter);
     }
 
+    // Every array header has a `[`, so plain key:value lines skip those regexes
+    let array_header = stripped.contains('[');
+
     // Check for tabular array
-    if let Some(caps) = TABULAR_HEADER_RE.captures(stripped) {
+    if array_header && let Some(caps) = TABULAR_HEADER_RE.captures(stripped) {
         let name = caps.get(1).map(|m| m.as_str()).unwrap_or("");
         if !name.is_empty() {
             return decode_object(lines, idx, depth, delimiter);
@@ -553,7 +546,7 @@ fn decode_value(
     }
 
     // Check for primitive array
-    if let Some(caps) = PRIMITIVE_ARRAY_RE.captures(stripped) {
+    if array_header && let Some(caps) = PRIMITIVE_ARRAY_RE.captures(stripped) {
         let name = caps.get(1).map(|m| m.as_str()).unwrap_or("");
         let values_part = caps.get(3).map(|m| m.as_str()).unwrap_or("").trim();
         if !values_part.is_empty() {
@@ -565,7 +558,7 @@ fn decode_value(
     }
 
     // Check for list array
-    if let Some(caps) = LIST_ARRAY_RE.captures(stripped) {
+    if array_header && let Some(caps) = LIST_ARRAY_RE.captures(stripped) {
         let name = caps.get(1).map(|m| m.as_str()).unwrap_or("");
         if !name.is_empty() {
             return decode_object(lines, idx, depth, delimiter);
@@ -602,7 +595,8 @@ fn decode_tabular_array(
     let fields: Vec<&str> = fields_str.split(delimiter).map(|s| s.trim()).collect();
 
     let mut idx = idx + 1;
-    let mut result = Vec::new();
+    // Bound the preallocation by the lines actually present, not the declared count
+    let mut result = Vec::with_capacity(count.min(lines.len().saturating_sub(idx)));
 
     while idx < lines.len() && result.len() < count {
         let row_line = lines[idx].trim();
@@ -612,15 +606,13 @@ fn decode_tabular_array(
         }
 
         let values = split_row(row_line, delimiter);
-        let mut obj = Map::new();
-
-        for (i, field) in fields.iter().enumerate() {
-            if i < values.len() {
-                let raw = &values[i];
-                let val = parse_primitive(raw);
-                if !matches!(val, Value::Null) || !raw.trim().is_empty() {
-                    obj.insert(field.to_string(), val);
-                }
+        let mut obj = Map::with_capacity(fields.len());
+
+        // Pair fields with cells positionally; cells past the end are missing.
+        // Empty cells are missing fields, anything else (even "null") is present.
+        for (field, raw) in fields.iter().zip(&values) {
+            if !raw.trim().is_empty() {
+                obj.insert(field.to_string(), parse_primitive(raw));
             }
         }
 
@@ -835,8 +827,9 @@ fn decode_object(
 
         let stripped = line.trim();
 
-        // Check for array patterns first
-        if let Some(caps) = TABULAR_HEADER_RE.captures(stripped) {
+        // Check for array patterns first (only lines with a `[` can match)
+        let array_header = stripped.contains('[');
+        if array_header && let Some(caps) = TABULAR_HEADER_RE.captures(stripped) {
             let (nested, new_idx) = decode_tabular_array(lines, idx, line_depth, delimiter, &caps)?;
             if let Value::Object(map) = nested {
                 for (k, v) in map {
@@ -847,7 +840,7 @@ fn decode_object(
             continue;
         }
 
-        if let Some(caps) = PRIMITIVE_ARRAY_RE.captures(stripped) {
+        if array_header && let Some(caps) = PRIMITIVE_ARRAY_RE.captures(stripped) {
             let values_part = caps.get(3).map(|m| m.as_str()).unwrap_or("").trim();
             if !values_part.is_empty() {
                 let (nested, new_idx) = decode_primitive_array(&caps, delimiter, idx)?;
@@ -861,7 +854,7 @@ fn decode_object(
             }
         }
 
-        if let Some(caps) = LIST_ARRAY_RE.captures(stripped) {
+        if array_header && let Some(caps) = LIST_ARRAY_RE.captures(stripped) {
             let (nested, new_idx) = decode_list_array(lines, idx, line_depth, delimiter, &caps)?;
             if let Value::Object(map) = nested {
                 for (k, v) in map {
@@ -922,6 +915,19 @@ mod tests {
         assert!(encoded.contains("Alice"));
     }
 
+    #[test]
+    fn test_encode_tabular_rows_in_any_key_order() {
+        let data = json!([
+            {"id": 1, "name": "Alice"},
+            {"name": "Bob", "id": 2},
+            {"id": 3}
+        ]);
+        let encoded = encode(&data, false).unwrap();
+        assert_eq!(encoded, "[3]{id\tname}\n1\tAlice\n2\tBob\n3");
+        let with_header = encode(&data, true).unwrap();
+        assert_eq!(decode(&with_header).unwrap(), data);
+    }
+
     #[test]
     fn test_encode_with_header() {
         let data = json!({"name": "test"});
@@ -1073,6 +1079,20 @@ mod tests {
         assert_eq!(users.as_array().unwrap().len(), 2);
     }
 
+    #[test]
+    fn test_roundtrip_trailing_missing_cells() {
+        let data = json!([
+            {"id": 1, "name": "Alice", "email": "a@example.com"},
+            {"id": 2, "name": "Bob"},
+            {"id": 3, "email": "c@example.com"}
+        ]);
+        let encoded = encode(&data, false).unwrap();
+        // Trailing missing cells are not emitted
+        assert!(encoded.lines().any(|l| l == "2\tBob"));
+        assert!(encoded.lines().any(|l| l == "3\t\tc@example.com"));
+        assert_eq!(decode(&format!("{}\n\n{}", HEADER, encoded)).unwrap(), data);
+    }
+
     #[test]
     fn test_roundtrip_nested_object() {
         let data = json!({
@@ -1130,6 +1150,8 @@ mod tests {
     fn test_needs_quote_delimiter() {
         assert!(needs_quote("has\ttab", "\t"));
         assert!(needs_quote("has,comma", ","));
+        assert!(needs_quote("a::b", "::"));
+        assert!(!needs_quote("caf\u{e9}", "\t"));
     }
 
     #[test]
@@ -1148,6 +1170,8 @@ mod tests {
 
     #[test]
     fn test_needs_quote_looks_like_primitive() {
+        assert!(needs_quote("TRUE", "\t"));
+        assert!(needs_quote("Null", "\t"));
         assert!(needs_quote("true", "\t"));
         assert!(needs_quote("false", "\t"));
         assert!(needs_quote("null", "\t"));
@@ -1167,6 +1191,7 @@ mod tests {
         assert_eq!(quote_string("say \"hi\""), "\"say \\\"hi\\\"\"");
         assert_eq!(quote_string("line\nbreak"), "\"line\\nbreak\"");
         assert_eq!(quote_string("tab\there"), "\"tab\\there\"");
+        assert_eq!(quote_string("a\\b\r"), "\"a\\\\b\\r\"");
     }
 
     #[test]
@@ -1235,8 +1260,8 @@ mod tests {
         let arr = vec![json!({"id": 1, "name": "a"}), json!({"id": 2, "name": "b"})];
         let (uniform, fields) = is_uniform_array(&arr);
         assert!(uniform);
-        assert!(fields.contains(&"id".to_string()));
-        assert!(fields.contains(&"name".to_string()));
+        assert!(fields.contains(&"id"));
+        assert!(fields.contains(&"name"));
     }
 
     #[test]
@@ -1271,6 +1296,12 @@ mod tests {
         assert_eq!(row, vec!["\"a\\\"b\"", "c"]);
     }
 
+    #[test]
+    fn test_split_row_multi_char_delimiter() {
+        let row = split_row("caf\u{e9}::\"a\\\"::b\"::c", "::");
+        assert_eq!(row, vec!["caf\u{e9}", "\"a\\\"::b\"", "c"]);
+    }
+
     #[test]
     fn test_get_indent_depth() {
         assert_eq!(get_indent_depth("no indent"), 0);
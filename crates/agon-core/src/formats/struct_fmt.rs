@@ -11,19 +11,23 @@
 //! - key: StructName(val1, val2, val3)
 //! ```
 
+use rayon::prelude::*;
 use regex::Regex;
+use rustc_hash::FxHashMap;
 use serde_json::{Map, Value};
-use std::collections::HashMap;
+use std::collections::{HashMap, HashSet};
+use std::fmt::Write;
 use std::sync::LazyLock;
 
 use crate::error::{AgonError, Result};
+use crate::utils::{self, LineWriter};
 
 const HEADER: &str = "@AGON struct";
-const INDENT: &str = "  ";
+
+/// Arrays at least this long have their shapes counted in parallel
+const PARALLEL_SHAPE_MIN_ITEMS: usize = 1024;
 
 // Regex patterns
-static NUMBER_RE: LazyLock<Regex> =
-    LazyLock::new(|| Regex::new(r"^-?(?:0|[1-9]\d*)(?:\.\d+)?(?:[eE][+-]?\d+)?$").unwrap());
 static STRUCT_DEF_RE: LazyLock<Regex> =
     LazyLock::new(|| Regex::new(r"^@(\w+)(?:\(([^)]+)\))?:\s*(.*)$").unwrap());
 static STRUCT_INST_RE: LazyLock<Regex> = LazyLock::new(|| Regex::new(r"^(\w+)\(").unwrap());
@@ -31,9 +35,19 @@ static KEY_VALUE_RE: LazyLock<Regex> = LazyLock::new(|| Regex::new(r"^([^:]+):\s
 static ARRAY_HEADER_RE: LazyLock<Regex> =
     LazyLock::new(|| Regex::new(r"^(\w*)\[(\d+)\]:?").unwrap());
 
-/// Struct definition stored in registry: (fields, optional_fields, parents)
-type StructDef = (Vec<String>, Vec<String>, Vec<String>);
-type StructRegistry = HashMap<String, StructDef>;
+/// Registered structs by name, each resolved to its full field list
+/// (inherited fields first). Optional markers and parent names only matter
+/// while resolving, so they aren't kept.
+type StructRegistry = HashMap<String, Vec<String>>;
+
+/// Struct resolved for encoding instances: (name, fields in instance order)
+type Template = (String, Vec<String>);
+
+/// Template by sorted field list, for constant-time template lookup while encoding
+///
+/// Shape maps hash a whole field list per object, so they use the cheaper Fx
+/// hasher; they live only for one encode call.
+type ShapeIndex = FxHashMap<Shape, Template>;
 
 /// Struct definition with name for creation: (name, fields, optional_fields, parents)
 #[allow(clippy::type_complexity)]
@@ -41,7 +55,7 @@ type StructDefWithName = (String, Vec<String>, Vec<String>, Vec<String>);
 
 /// Encode data to AGONStruct format
 pub fn encode(data: &Value, include_header: bool) -> Result<String> {
-    let mut lines = Vec::new();
+    let mut lines = LineWriter::new();
 
     // Detect shapes and create struct definitions
     let shapes = detect_shapes(data);
@@ -49,13 +63,14 @@ pub fn encode(data: &Value, include_header: bool) -> Result<String> {
 
     // Build registry
     let mut registry = StructRegistry::new();
-    for (name, fields, optional, parents) in &struct_defs {
-        register_struct(&mut registry, name, fields, optional, parents)?;
+    for (name, fields, _, parents) in &struct_defs {
+        register_struct(&mut registry, name, fields, parents)?;
     }
+    let shape_index = build_shape_index(&registry);
 
     if include_header {
-        lines.push(HEADER.to_string());
-        lines.push(String::new());
+        lines.push(HEADER);
+        lines.push("");
     }
 
     // Emit struct definitions
@@ -73,9 +88,9 @@ pub fn encode(data: &Value, include_header: bool) -> Result<String> {
                 .collect();
 
             if parents.is_empty() {
-                lines.push(format!("@{}: {}", name, fields_str.join(", ")));
+                lines.push_fmt(format_args!("@{}: {}", name, fields_str.join(", ")));
             } else {
-                lines.push(format!(
+                lines.push_fmt(format_args!(
                     "@{}({}): {}",
                     name,
                     parents.join(", "),
@@ -83,12 +98,12 @@ pub fn encode(data: &Value, include_header: bool) -> Result<String> {
                 ));
             }
         }
-        lines.push(String::new());
+        lines.push("");
     }
 
-    encode_value(data, &mut lines, 0, &registry);
+    encode_value(data, &mut lines, 0, &shape_index);
 
-    Ok(lines.join("\n"))
+    Ok(lines.into_string())
 }
 
 /// Decode AGONStruct payload
@@ -122,8 +137,8 @@ pub fn decode(payload: &str) -> Result<Value> {
             break;
         }
         if let Some(parsed) = parse_struct_def(line) {
-            let (name, fields, optional, parents) = parsed;
-            register_struct(&mut registry, &name, &fields, &optional, &parents)?;
+            let (name, fields, _, parents) = parsed;
+            register_struct(&mut registry, &name, &fields, &parents)?;
         }
         idx += 1;
     }
@@ -149,30 +164,57 @@ pub fn decode(payload: &str) -> Result<Value> {
 type Shape = Vec<String>;
 
 fn get_shape(obj: &Map<String, Value>) -> Shape {
-    let mut fields: Vec<String> = obj
+    shape_keys(obj).into_iter().map(str::to_string).collect()
+}
+
+/// Sorted primitive field names, borrowed from the object.
+///
+/// Shape counting only needs to hash and compare keys, so it borrows them
+/// and leaves the owned copies to the few shapes that become structs.
+fn shape_keys(obj: &Map<String, Value>) -> Vec<&str> {
+    let mut fields: Vec<&str> = obj
         .iter()
         .filter(|(_, v)| !v.is_object() && !v.is_array())
-        .map(|(k, _)| k.clone())
+        .map(|(k, _)| k.as_str())
         .collect();
-    fields.sort();
+    fields.sort_unstable();
     fields
 }
 
-fn detect_shapes(data: &Value) -> HashMap<Shape, usize> {
-    let mut shapes = HashMap::new();
+fn detect_shapes(data: &Value) -> FxHashMap<Vec<&str>, usize> {
+    let mut shapes = FxHashMap::default();
     collect_shapes(data, &mut shapes);
     shapes
 }
 
-fn collect_shapes(data: &Value, shapes: &mut HashMap<Shape, usize>) {
+fn collect_shapes<'a>(data: &'a Value, shapes: &mut FxHashMap<Vec<&'a str>, usize>) {
     match data {
+        Value::Array(arr) if arr.len() >= PARALLEL_SHAPE_MIN_ITEMS => {
+            // Tally chunks of a large array on the rayon pool, then merge the
+            // per-chunk counts; counting is associative, so totals match
+            let counts = arr
+                .par_iter()
+                .fold(FxHashMap::default, |mut chunk, item| {
+                    collect_shapes(item, &mut chunk);
+                    chunk
+                })
+                .reduce(FxHashMap::default, |mut merged, chunk| {
+                    for (shape, count) in chunk {
+                        *merged.entry(shape).or_insert(0) += count;
+                    }
+                    merged
+                });
+            for (shape, count) in counts {
+                *shapes.entry(shape).or_insert(0) += count;
+            }
+        }
         Value::Array(arr) => {
             for item in arr {
                 collect_shapes(item, shapes);
             }
         }
         Value::Object(obj) => {
-            let shape = get_shape(obj);
+            let shape = shape_keys(obj);
             if !shape.is_empty() {
                 *shapes.entry(shape).or_insert(0) += 1;
             }
@@ -185,33 +227,38 @@ fn collect_shapes(data: &Value, shapes: &mut HashMap<Shape, usize>) {
 }
 
 fn create_struct_definitions(
-    shapes: &HashMap<Shape, usize>,
+    shapes: &FxHashMap<Vec<&str>, usize>,
     min_occurrences: usize,
     min_fields: usize,
 ) -> Vec<StructDefWithName> {
-    let mut defs = Vec::new();
-    let mut used_names: std::collections::HashSet<String> = std::collections::HashSet::new();
+    let mut candidates: Vec<(&[&str], usize)> = shapes
+        .iter()
+        .filter(|(shape, count)| **count >= min_occurrences && shape.len() >= min_fields)
+        .map(|(shape, count)| (shape.as_slice(), *count))
+        .collect();
 
-    for (shape, count) in shapes {
-        if *count >= min_occurrences && shape.len() >= min_fields {
-            let name = generate_struct_name(shape, &mut used_names);
-            defs.push((name, shape.clone(), vec![], vec![]));
-        }
-    }
+    // Most frequent shapes first (integer compare), ties broken by field list so
+    // definition order and collision suffixes don't depend on HashMap iteration
+    candidates.sort_unstable_by(|a, b| b.1.cmp(&a.1).then_with(|| a.0.cmp(b.0)));
 
-    defs
+    let mut used_names: HashSet<String> = HashSet::new();
+    candidates
+        .into_iter()
+        .map(|(shape, _)| {
+            let name = generate_struct_name(shape, &mut used_names);
+            let fields = shape.iter().map(|f| f.to_string()).collect();
+            (name, fields, vec![], vec![])
+        })
+        .collect()
 }
 
 /// Generate a struct name from field names
 /// Takes first letter of each field (up to 4), adds counter on collision
-fn generate_struct_name(
-    fields: &[String],
-    used_names: &mut std::collections::HashSet<String>,
-) -> String {
+fn generate_struct_name<S: AsRef<str>>(fields: &[S], used_names: &mut HashSet<String>) -> String {
     // Take first letter of each field, truncate to 4 chars max
     let base_name: String = fields
         .iter()
-        .filter_map(|f| f.chars().next())
+        .filter_map(|f| f.as_ref().chars().next())
         .map(|c| c.to_ascii_uppercase())
         .take(4)
         .collect();
@@ -238,33 +285,24 @@ fn register_struct(
     registry: &mut StructRegistry,
     name: &str,
     fields: &[String],
-    optional: &[String],
     parents: &[String],
 ) -> Result<()> {
     let mut all_fields = Vec::new();
+    // Fields already taken, so dedupe is a hash probe rather than a scan of all_fields
+    let mut seen: HashSet<&str> = HashSet::new();
 
-    // Resolve parent fields
-    for parent_name in parents {
-        if let Some((parent_fields, _, _)) = registry.get(parent_name) {
-            for f in parent_fields {
-                if !all_fields.contains(f) {
-                    all_fields.push(f.clone());
-                }
-            }
-        }
-    }
-
-    // Add own fields
-    for f in fields {
-        if !all_fields.contains(f) {
+    // Resolve parent fields, then add own fields
+    let parent_fields = parents
+        .iter()
+        .filter_map(|parent_name| registry.get(parent_name))
+        .flatten();
+    for f in parent_fields.chain(fields) {
+        if seen.insert(f.as_str()) {
             all_fields.push(f.clone());
         }
     }
 
-    registry.insert(
-        name.to_string(),
-        (all_fields, optional.to_vec(), parents.to_vec()),
-    );
+    registry.insert(name.to_string(), all_fields);
     Ok(())
 }
 
@@ -280,12 +318,7 @@ fn format_primitive(val: &Value) -> String {
         Value::String(s) => {
             // Quote if contains special chars or could be parsed as another type
             if needs_quote(s) {
-                format!(
-                    "\"{}\"",
-                    s.replace('\\', "\\\\")
-                        .replace('"', "\\\"")
-                        .replace('\n', "\\n")
-                )
+                quote_string(s)
             } else {
                 s.clone()
             }
@@ -294,6 +327,45 @@ fn format_primitive(val: &Value) -> String {
     }
 }
 
+/// Quote a string, escaping backslash, quote and newline in one pass
+fn quote_string(s: &str) -> String {
+    let mut out = String::with_capacity(s.len() + 2);
+    out.push('"');
+    for c in s.chars() {
+        match c {
+            '\\' => out.push_str("\\\\"),
+            '"' => out.push_str("\\\""),
+            '\n' => out.push_str("\\n"),
+            _ => out.push(c),
+        }
+    }
+    out.push('"');
+    out
+}
+
+/// Reverse `quote_string` escapes in one pass; unknown escapes are kept as-is
+fn unescape(inner: &str) -> String {
+    let mut out = String::with_capacity(inner.len());
+    let mut chars = inner.chars();
+    while let Some(c) = chars.next() {
+        if c != '\\' {
+            out.push(c);
+            continue;
+        }
+        match chars.next() {
+            Some('n') => out.push('\n'),
+            Some('"') => out.push('"'),
+            Some('\\') => out.push('\\'),
+            Some(other) => {
+                out.push('\\');
+                out.push(other);
+            }
+            None => out.push('\\'),
+        }
+    }
+    out
+}
+
 /// Check if a string needs quoting to preserve its type
 fn needs_quote(s: &str) -> bool {
     if s.is_empty() {
@@ -320,18 +392,36 @@ fn needs_quote(s: &str) -> bool {
         return true;
     }
     // Boolean/null keywords
-    let lower = s.to_lowercase();
-    if lower == "true" || lower == "false" || lower == "null" {
-        return true;
-    }
-    // Looks like a number - needs quoting to preserve string type
-    if s.parse::<i64>().is_ok() || s.parse::<f64>().is_ok() {
+    if ["true", "false", "null"]
+        .iter()
+        .any(|kw| s.eq_ignore_ascii_case(kw))
+    {
         return true;
     }
-    false
+    // Looks like a number - needs quoting to preserve string type. Every i64
+    // literal also parses as f64, and the prefilter skips the parse for words
+    utils::may_parse_float(s) && s.parse::<f64>().is_ok()
+}
+
+/// Index registered structs by their sorted field list
+///
+/// Each entry carries the resolved field order, so encoding an instance needs
+/// no further registry lookup.
+fn build_shape_index(registry: &StructRegistry) -> ShapeIndex {
+    registry
+        .iter()
+        .map(|(name, fields)| {
+            let mut shape = fields.clone();
+            shape.sort();
+            (shape, (name.clone(), fields.clone()))
+        })
+        .collect()
 }
 
-fn find_matching_struct(obj: &Map<String, Value>, registry: &StructRegistry) -> Option<String> {
+fn find_matching_struct<'a>(
+    obj: &Map<String, Value>,
+    shape_index: &'a ShapeIndex,
+) -> Option<&'a Template> {
     // Object must have only primitive values to use struct encoding
     // If it has nested objects/arrays, we can't use struct templates
     for v in obj.values() {
@@ -345,42 +435,49 @@ fn find_matching_struct(obj: &Map<String, Value>, registry: &StructRegistry) ->
         return None;
     }
 
-    for (name, (fields, _, _)) in registry {
-        // Check if all required fields match
-        let mut sorted_fields = fields.clone();
-        sorted_fields.sort();
-        if sorted_fields == shape {
-            return Some(name.clone());
+    shape_index.get(&shape)
+}
+
+/// Append `Name(v1, v2, ...)` for `obj`, with values in template field order
+fn push_instance(out: &mut String, (name, fields): &Template, obj: &Map<String, Value>) {
+    out.push_str(name);
+    out.push('(');
+    for (i, field) in fields.iter().enumerate() {
+        if i > 0 {
+            out.push_str(", ");
+        }
+        if let Some(v) = obj.get(field) {
+            out.push_str(&format_primitive(v));
         }
     }
-    None
+    out.push(')');
 }
 
-fn encode_value(val: &Value, lines: &mut Vec<String>, depth: usize, registry: &StructRegistry) {
-    let indent = INDENT.repeat(depth);
+fn encode_value(val: &Value, lines: &mut LineWriter, depth: usize, shape_index: &ShapeIndex) {
+    let indent = utils::indent(depth);
 
     match val {
         Value::Null | Value::Bool(_) | Value::Number(_) | Value::String(_) => {
-            lines.push(format!("{}{}", indent, format_primitive(val)));
+            lines.push_fmt(format_args!("{}{}", indent, format_primitive(val)));
         }
         Value::Array(arr) => {
-            encode_array(arr, lines, depth, registry);
+            encode_array(arr, lines, depth, shape_index);
         }
         Value::Object(obj) => {
-            encode_object(obj, lines, depth, registry, None);
+            encode_object(obj, lines, depth, shape_index, None);
         }
     }
 }
 
-fn encode_array(arr: &[Value], lines: &mut Vec<String>, depth: usize, registry: &StructRegistry) {
-    let indent = INDENT.repeat(depth);
+fn encode_array(arr: &[Value], lines: &mut LineWriter, depth: usize, shape_index: &ShapeIndex) {
+    let indent = utils::indent(depth);
 
     if arr.is_empty() {
-        lines.push(format!("{}[0]:", indent));
+        lines.push_fmt(format_args!("{}[0]:", indent));
         return;
     }
 
-    lines.push(format!("{}[{}]:", indent, arr.len()));
+    lines.push_fmt(format_args!("{}[{}]:", indent, arr.len()));
 
     for item in arr {
         if let Some(obj) = item.as_object() {
@@ -388,36 +485,27 @@ fn encode_array(arr: &[Value], lines: &mut Vec<String>, depth: usize, registry:
             // If object has nested objects/arrays, use list item format to preserve them
             let has_nested = obj.values().any(|v| v.is_object() || v.is_array());
 
-            if !has_nested
-                && let Some(struct_name) = find_matching_struct(obj, registry)
-                && let Some((fields, _, _)) = registry.get(&struct_name)
-            {
-                let values: Vec<String> = fields
-                    .iter()
-                    .map(|f| obj.get(f).map(format_primitive).unwrap_or_default())
-                    .collect();
-                lines.push(format!(
-                    "{}  - {}({})",
-                    indent,
-                    struct_name,
-                    values.join(", ")
-                ));
+            if !has_nested && let Some(template) = find_matching_struct(obj, shape_index) {
+                let line = lines.line();
+                line.push_str(&indent);
+                line.push_str("  - ");
+                push_instance(line, template, obj);
                 continue;
             }
-            encode_list_item(obj, lines, depth + 1, registry);
+            encode_list_item(obj, lines, depth + 1, shape_index);
         } else {
-            lines.push(format!("{}  - {}", indent, format_primitive(item)));
+            lines.push_fmt(format_args!("{}  - {}", indent, format_primitive(item)));
         }
     }
 }
 
 fn encode_list_item(
     obj: &Map<String, Value>,
-    lines: &mut Vec<String>,
+    lines: &mut LineWriter,
     depth: usize,
-    registry: &StructRegistry,
+    shape_index: &ShapeIndex,
 ) {
-    let indent = INDENT.repeat(depth);
+    let indent = utils::indent(depth);
     let mut first = true;
 
     for (k, v) in obj {
@@ -430,34 +518,25 @@ fn encode_list_item(
 
         // Check if value can use a struct
         if let Some(nested_obj) = v.as_object()
-            && let Some(struct_name) = find_matching_struct(nested_obj, registry)
-            && let Some((fields, _, _)) = registry.get(&struct_name)
+            && let Some(template) = find_matching_struct(nested_obj, shape_index)
         {
-            let values: Vec<String> = fields
-                .iter()
-                .map(|f| nested_obj.get(f).map(format_primitive).unwrap_or_default())
-                .collect();
-            lines.push(format!(
-                "{}{}: {}({})",
-                prefix,
-                k,
-                struct_name,
-                values.join(", ")
-            ));
+            let line = lines.line();
+            let _ = write!(line, "{}{}: ", prefix, k);
+            push_instance(line, template, nested_obj);
             continue;
         }
 
         match v {
             Value::Object(nested) => {
-                lines.push(format!("{}{}:", prefix, k));
-                encode_object(nested, lines, depth + 2, registry, None);
+                lines.push_fmt(format_args!("{}{}:", prefix, k));
+                encode_object(nested, lines, depth + 2, shape_index, None);
             }
             Value::Array(arr) => {
-                lines.push(format!("{}{}:", prefix, k));
-                encode_array(arr, lines, depth + 2, registry);
+                lines.push_fmt(format_args!("{}{}:", prefix, k));
+                encode_array(arr, lines, depth + 2, shape_index);
             }
             _ => {
-                lines.push(format!("{}{}: {}", prefix, k, format_primitive(v)));
+                lines.push_fmt(format_args!("{}{}: {}", prefix, k, format_primitive(v)));
             }
         }
     }
@@ -465,51 +544,47 @@ fn encode_list_item(
 
 fn encode_object(
     obj: &Map<String, Value>,
-    lines: &mut Vec<String>,
+    lines: &mut LineWriter,
     depth: usize,
-    registry: &StructRegistry,
+    shape_index: &ShapeIndex,
     name: Option<&str>,
 ) {
-    let indent = INDENT.repeat(depth);
+    let indent = utils::indent(depth);
     let mut actual_depth = depth;
 
     if let Some(n) = name {
-        lines.push(format!("{}{}:", indent, n));
+        lines.push_fmt(format_args!("{}{}:", indent, n));
         actual_depth += 1;
     }
 
-    let actual_indent = INDENT.repeat(actual_depth);
+    let actual_indent = utils::indent(actual_depth);
 
     for (k, v) in obj {
         // Check if value can use a struct
         if let Some(nested_obj) = v.as_object()
-            && let Some(struct_name) = find_matching_struct(nested_obj, registry)
-            && let Some((fields, _, _)) = registry.get(&struct_name)
+            && let Some(template) = find_matching_struct(nested_obj, shape_index)
         {
-            let values: Vec<String> = fields
-                .iter()
-                .map(|f| nested_obj.get(f).map(format_primitive).unwrap_or_default())
-                .collect();
-            lines.push(format!(
-                "{}{}: {}({})",
-                actual_indent,
-                k,
-                struct_name,
-                values.join(", ")
-            ));
+            let line = lines.line();
+            let _ = write!(line, "{}{}: ", actual_indent, k);
+            push_instance(line, template, nested_obj);
             continue;
         }
 
         match v {
             Value::Object(nested) => {
-                encode_object(nested, lines, actual_depth, registry, Some(k));
+                encode_object(nested, lines, actual_depth, shape_index, Some(k));
             }
             Value::Array(arr) => {
-                lines.push(format!("{}{}", actual_indent, k));
-                encode_array(arr, lines, actual_depth + 1, registry);
+                lines.push_fmt(format_args!("{}{}", actual_indent, k));
+                encode_array(arr, lines, actual_depth + 1, shape_index);
             }
             _ => {
-                lines.push(format!("{}{}: {}", actual_indent, k, format_primitive(v)));
+                lines.push_fmt(format_args!(
+                    "{}{}: {}",
+                    actual_indent,
+                    k,
+                    format_primitive(v)
+                ));
             }
         }
     }
@@ -561,13 +636,7 @@ fn parse_primitive(s: &str) -> Value {
 
     // Quoted string
     if s.starts_with('"') && s.ends_with('"') {
-        let inner = &s[1..s.len() - 1];
-        return Value::String(
-            inner
-                .replace("\\n", "\n")
-                .replace("\\\"", "\"")
-                .replace("\\\\", "\\"),
-        );
+        return Value::String(unescape(&s[1..s.len() - 1]));
     }
 
     // Boolean/null
@@ -579,16 +648,20 @@ fn parse_primitive(s: &str) -> Value {
     }
 
     // Number
-    if NUMBER_RE.is_match(s) {
-        if s.contains('.') || s.to_lowercase().contains('e') {
+    match utils::scan_number(s) {
+        Some(true) => {
+            if let Ok(i) = s.parse::<i64>() {
+                return Value::Number(i.into());
+            }
+        }
+        Some(false) => {
             if let Ok(f) = s.parse::<f64>()
                 && let Some(n) = serde_json::Number::from_f64(f)
             {
                 return Value::Number(n);
             }
-        } else if let Ok(i) = s.parse::<i64>() {
-            return Value::Number(i.into());
         }
+        None => {}
     }
 
     Value::String(s.to_string())
@@ -604,7 +677,7 @@ fn parse_struct_instance(s: &str, registry: &StructRegistry) -> Option<Value> {
     let caps = STRUCT_INST_RE.captures(s)?;
     let name = caps.get(1)?.as_str();
 
-    let (fields, _, _) = registry.get(name)?;
+    let fields = registry.get(name)?;
 
     // Find the closing paren
     let start = s.find('(')? + 1;
@@ -614,46 +687,40 @@ fn parse_struct_instance(s: &str, registry: &StructRegistry) -> Option<Value> {
     // Split values (respecting nested parens and quotes)
     let values = split_struct_values(values_str);
 
-    let mut obj = Map::new();
-    for (i, field) in fields.iter().enumerate() {
-        if let Some(val_str) = values.get(i) {
-            // Recursively parse struct instances
-            let val = if let Some(nested) = parse_struct_instance(val_str.trim(), registry) {
-                nested
-            } else {
-                parse_primitive(val_str)
-            };
-            obj.insert(field.clone(), val);
-        }
+    // Pair fields with values positionally; trailing fields without a value are omitted
+    let mut obj = Map::with_capacity(values.len().min(fields.len()));
+    for (field, val_str) in fields.iter().zip(values) {
+        // Recursively parse struct instances
+        let val =
+            parse_struct_instance(val_str, registry).unwrap_or_else(|| parse_primitive(val_str));
+        obj.insert(field.clone(), val);
     }
 
     Some(Value::Object(obj))
 }
 
-fn split_struct_values(s: &str) -> Vec<String> {
+/// Split on top-level commas, returning trimmed slices of `s`
+fn split_struct_values(s: &str) -> Vec<&str> {
     let mut values = Vec::new();
-    let mut current = String::new();
+    let mut start = 0;
     let mut paren_depth = 0;
     let mut in_quote = false;
 
-    for c in s.chars() {
+    for (i, c) in s.char_indices() {
         match c {
-            '"' if !in_quote => in_quote = true,
-            '"' if in_quote => in_quote = false,
+            '"' => in_quote = !in_quote,
             '(' if !in_quote => paren_depth += 1,
             ')' if !in_quote => paren_depth -= 1,
             ',' if !in_quote && paren_depth == 0 => {
-                values.push(current.trim().to_string());
-                current = String::new();
-                continue;
+                values.push(s[start..i].trim());
+                start = i + 1;
             }
             _ => {}
         }
-        current.push(c);
     }
 
-    if !current.is_empty() {
-        values.push(current.trim().to_string());
+    if start < s.len() {
+        values.push(s[start..].trim());
     }
 
     values
@@ -1167,6 +1234,16 @@ mod tests {
         assert!(result.is_null());
     }
 
+    #[test]
+    fn test_split_struct_values() {
+        assert_eq!(
+            split_struct_values(r#"1, "a, b", P(2, 3) ,"#),
+            ["1", r#""a, b""#, "P(2, 3)"]
+        );
+        assert_eq!(split_struct_values("1, "), ["1", ""]);
+        assert!(split_struct_values("").is_empty());
+    }
+
     #[test]
     fn test_decode_simple_struct_instance() {
         let payload = "@AGON struct\n\n@FR: fmt, raw\n\nprice: FR(\"100.00\", 100.0)";
@@ -1369,8 +1446,25 @@ mod tests {
         let shapes = detect_shapes(&data);
         // Should have one shape with count 3
         assert!(!shapes.is_empty());
-        let shape = vec!["a".to_string(), "b".to_string()];
-        assert_eq!(shapes.get(&shape), Some(&3));
+        assert_eq!(shapes.get(&vec!["a", "b"]), Some(&3));
+    }
+
+    #[test]
+    fn test_detect_shapes_large_array_matches_sequential_count() {
+        let items: Vec<Value> = (0..PARALLEL_SHAPE_MIN_ITEMS * 3)
+            .map(|i| match i % 3 {
+                0 => json!({"a": i, "b": {"x": 1, "y": 2}}),
+                1 => json!({"a": i, "c": true}),
+                _ => json!({"d": null}),
+            })
+            .collect();
+        let data = Value::Array(items);
+        let shapes = detect_shapes(&data);
+        assert_eq!(shapes.len(), 4);
+        assert_eq!(shapes[&vec!["a"]], PARALLEL_SHAPE_MIN_ITEMS);
+        assert_eq!(shapes[&vec!["x", "y"]], PARALLEL_SHAPE_MIN_ITEMS);
+        assert_eq!(shapes[&vec!["a", "c"]], PARALLEL_SHAPE_MIN_ITEMS);
+        assert_eq!(shapes[&vec!["d"]], PARALLEL_SHAPE_MIN_ITEMS);
     }
 
     #[test]
@@ -1389,49 +1483,70 @@ mod tests {
         assert_eq!(name, "FR2"); // Should add counter
     }
 
+    #[test]
+    fn test_create_struct_definitions_ordered_by_count() {
+        let shape = |fields: &[&str]| -> Shape { fields.iter().map(|f| f.to_string()).collect() };
+        let mut shapes = FxHashMap::default();
+        shapes.insert(vec!["fmt", "raw"], 3);
+        shapes.insert(vec!["fee", "rate"], 3);
+        shapes.insert(vec!["id", "name"], 5);
+        shapes.insert(vec!["x", "y"], 2);
+
+        let defs = create_struct_definitions(&shapes, 3, 2);
+        let names: Vec<&str> = defs.iter().map(|d| d.0.as_str()).collect();
+        // Most frequent first, then by field list; collision suffix is stable
+        assert_eq!(names, ["IN", "FR", "FR2"]);
+        assert_eq!(defs[1].1, shape(&["fee", "rate"]));
+    }
+
+    #[test]
+    fn test_register_struct_dedupes_inherited_fields() {
+        let owned =
+            |fields: &[&str]| -> Vec<String> { fields.iter().map(|f| f.to_string()).collect() };
+        let mut registry = StructRegistry::new();
+        register_struct(&mut registry, "P", &owned(&["a", "b"]), &[]).unwrap();
+        register_struct(&mut registry, "C", &owned(&["b", "c", "a"]), &owned(&["P"])).unwrap();
+        // Parent fields first, then new own fields, each once
+        assert_eq!(registry["C"], owned(&["a", "b", "c"]));
+    }
+
     #[test]
     fn test_find_matching_struct() {
         let mut registry = StructRegistry::new();
-        registry.insert(
-            "FR".to_string(),
-            (vec!["fmt".to_string(), "raw".to_string()], vec![], vec![]),
-        );
+        registry.insert("FR".to_string(), vec!["fmt".to_string(), "raw".to_string()]);
 
         let obj = json!({"fmt": "100", "raw": 100})
             .as_object()
             .unwrap()
             .clone();
-        let matched = find_matching_struct(&obj, &registry);
-        assert_eq!(matched, Some("FR".to_string()));
+        let shape_index = build_shape_index(&registry);
+        let matched = find_matching_struct(&obj, &shape_index);
+        assert_eq!(matched.map(|(name, _)| name.as_str()), Some("FR"));
     }
 
     #[test]
     fn test_find_matching_struct_no_match() {
         let mut registry = StructRegistry::new();
-        registry.insert(
-            "FR".to_string(),
-            (vec!["fmt".to_string(), "raw".to_string()], vec![], vec![]),
-        );
+        registry.insert("FR".to_string(), vec!["fmt".to_string(), "raw".to_string()]);
 
         let obj = json!({"x": 1, "y": 2}).as_object().unwrap().clone();
-        let matched = find_matching_struct(&obj, &registry);
+        let shape_index = build_shape_index(&registry);
+        let matched = find_matching_struct(&obj, &shape_index);
         assert!(matched.is_none());
     }
 
     #[test]
     fn test_find_matching_struct_with_nested_returns_none() {
         let mut registry = StructRegistry::new();
-        registry.insert(
-            "FR".to_string(),
-            (vec!["fmt".to_string(), "raw".to_string()], vec![], vec![]),
-        );
+        registry.insert("FR".to_string(), vec!["fmt".to_string(), "raw".to_string()]);
 
         // Object with nested value - should not match struct
         let obj = json!({"fmt": "100", "raw": 100, "nested": {"a": 1}})
             .as_object()
             .unwrap()
             .clone();
-        let matched = find_matching_struct(&obj, &registry);
+        let shape_index = build_shape_index(&registry);
+        let matched = find_matching_struct(&obj, &shape_index);
         assert!(matched.is_none());
     }
 
@@ -7,7 +7,7 @@
 
 use pyo3::exceptions::PyNotImplementedError;
 use pyo3::prelude::*;
-use pyo3::types::{PyDict, PyList};
+use pyo3::types::{PyDict, PyList, PyString};
 use std::collections::HashMap;
 
 mod error;
@@ -113,39 +113,22 @@ fn build_keep_tree(keep_paths: &[String]) -> KeepTree {
     let mut tree = KeepTree::default();
 
     for raw_path in keep_paths {
-        let path = raw_path.trim().trim_matches('.');
-        if path.is_empty() {
-            continue;
-        }
-        let parts: Vec<&str> = path.split('.').filter(|p| !p.is_empty()).collect();
-        if parts.is_empty() {
-            continue;
-        }
-
-        // Walk the path and build nested structure
+        // Walk the segments in place; only the last one is a leaf
+        let mut parts = raw_path
+            .trim()
+            .trim_matches('.')
+            .split('.')
+            .filter(|p| !p.is_empty())
+            .peekable();
         let mut cur = &mut tree;
-        for (i, part) in parts.iter().enumerate() {
-            let is_last = i == parts.len() - 1;
-            let key = part.to_string();
-
-            if is_last {
-                // Leaf: set to None if not already a subtree
-                cur.children.entry(key).or_insert(None);
-            } else {
-                // Intermediate: ensure subtree exists
-                let entry = cur
-                    .children
-                    .entry(key)
-                    .or_insert_with(|| Some(Box::new(KeepTree::default())));
-                if let Some(subtree) = entry {
-                    cur = subtree.as_mut();
-                } else {
-                    // Was None (keep whole), upgrade to subtree
-                    let new_subtree = Box::new(KeepTree::default());
-                    *entry = Some(new_subtree);
-                    cur = entry.as_mut().unwrap().as_mut();
-                }
+        while let Some(part) = parts.next() {
+            let entry = cur.children.entry(part.to_string()).or_insert(None);
+            if parts.peek().is_none() {
+                // Leaf: keeps an existing subtree, otherwise None (keep whole)
+                break;
             }
+            // Intermediate: create the subtree, upgrading a "keep whole" leaf
+            cur = entry.get_or_insert_with(Box::default);
         }
     }
 
@@ -232,18 +215,22 @@ impl AGONRows {
     #[pyo3(signature = (data, include_header = false))]
     fn encode(data: &Bound<'_, PyAny>, include_header: bool) -> PyResult<String> {
         let value = types::py_to_json(data)?;
-        rows::encode(&value, include_header).map_err(|e| e.into())
+        // Release the GIL while encoding so other Python threads can run
+        data.py()
+            .detach(|| rows::encode(&value, include_header))
+            .map_err(|e| e.into())
     }
 
     #[staticmethod]
     fn decode(py: Python<'_>, payload: &str) -> PyResult<Py<PyAny>> {
-        let value = rows::decode(payload)?;
+        let value = py.detach(|| rows::decode(payload))?;
         types::json_to_py(py, &value)
     }
 
     #[staticmethod]
-    fn hint() -> String {
-        "Return in AGON rows format: Start with @AGON rows header, encode arrays as name[N]{fields} with tab-delimited rows".to_string()
+    fn hint(py: Python<'_>) -> Bound<'_, PyString> {
+        // Interned: built once, then every call returns the same str object
+        pyo3::intern!(py, "Return in AGON rows format: Start with @AGON rows header, encode arrays as name[N]{fields} with tab-delimited rows").clone()
     }
 
     fn __repr__(&self) -> String {
@@ -270,18 +257,22 @@ impl AGONColumns {
     #[pyo3(signature = (data, include_header = false))]
     fn encode(data: &Bound<'_, PyAny>, include_header: bool) -> PyResult<String> {
         let value = types::py_to_json(data)?;
-        columns::encode(&value, include_header).map_err(|e| e.into())
+        // Release the GIL while encoding so other Python threads can run
+        data.py()
+            .detach(|| columns::encode(&value, include_header))
+            .map_err(|e| e.into())
     }
 
     #[staticmethod]
     fn decode(py: Python<'_>, payload: &str) -> PyResult<Py<PyAny>> {
-        let value = columns::decode(payload)?;
+        let value = py.detach(|| columns::decode(payload))?;
         types::json_to_py(py, &value)
     }
 
     #[staticmethod]
-    fn hint() -> String {
-        "Return in AGON columns format: Start with @AGON columns header, transpose arrays to name[N] with ├/└ field: val1, val2, ...".to_string()
+    fn hint(py: Python<'_>) -> Bound<'_, PyString> {
+        // Interned: built once, then every call returns the same str object
+        pyo3::intern!(py, "Return in AGON columns format: Start with @AGON columns header, transpose arrays to name[N] with ├/└ field: val1, val2, ...").clone()
     }
 
     fn __repr__(&self) -> String {
@@ -308,18 +299,22 @@ impl AGONStruct {
     #[pyo3(signature = (data, include_header = false))]
     fn encode(data: &Bound<'_, PyAny>, include_header: bool) -> PyResult<String> {
         let value = types::py_to_json(data)?;
-        struct_fmt::encode(&value, include_header).map_err(|e| e.into())
+        // Release the GIL while encoding so other Python threads can run
+        data.py()
+            .detach(|| struct_fmt::encode(&value, include_header))
+            .map_err(|e| e.into())
     }
 
     #[staticmethod]
     fn decode(py: Python<'_>, payload: &str) -> PyResult<Py<PyAny>> {
-        let value = struct_fmt::decode(payload)?;
+        let value = py.detach(|| struct_fmt::decode(payload))?;
         types::json_to_py(py, &value)
     }
 
     #[staticmethod]
-    fn hint() -> String {
-        "Return in AGON struct format: Start with @AGON struct header, define templates as @Struct: fields, instantiate as Struct(v1, v2)".to_string()
+    fn hint(py: Python<'_>) -> Bound<'_, PyString> {
+        // Interned: built once, then every call returns the same str object
+        pyo3::intern!(py, "Return in AGON struct format: Start with @AGON struct header, define templates as @Struct: fields, instantiate as Struct(v1, v2)").clone()
     }
 
     fn __repr__(&self) -> String {
@@ -370,7 +365,10 @@ fn encode_auto_parallel(
     encoding: Option<&str>,
 ) -> PyResult<EncodingResult> {
     let value = types::py_to_json(data)?;
-    let result = formats::encode_auto_parallel(&value, force, min_savings, encoding)?;
+    // Release the GIL while rayon runs the candidate encoders
+    let result = data
+        .py()
+        .detach(|| formats::encode_auto_parallel(&value, force, min_savings, encoding))?;
     Ok(EncodingResult {
         format: result.format,
         text: result.text,
@@ -390,7 +388,7 @@ fn count_tokens(text: &str, encoding: &str) -> PyResult<usize> {
 #[pyfunction]
 fn encode_all_parallel(data: &Bound<'_, PyAny>) -> PyResult<Vec<EncodingResult>> {
     let value = types::py_to_json(data)?;
-    let results = formats::encode_all_parallel(&value)?;
+    let results = data.py().detach(|| formats::encode_all_parallel(&value))?;
     Ok(results
         .into_iter()
         .map(|r| EncodingResult {
@@ -508,6 +506,16 @@ mod tests {
         assert!(tree.children.contains_key("name"));
     }
 
+    #[test]
+    fn test_build_keep_tree_nested_path_overrides_leaf() {
+        for paths in [["user", "user.name"], ["user.name", "user"]] {
+            let paths: Vec<String> = paths.iter().map(|p| p.to_string()).collect();
+            let tree = build_keep_tree(&paths);
+            let user = tree.children.get("user").unwrap().as_ref().unwrap();
+            assert!(user.children.contains_key("name"));
+        }
+    }
+
     // Note: PyO3 integration tests (py_to_json, json_to_py) are tested via Python tests
     // since they require linking to Python runtime which isn't available in cargo test.
 }
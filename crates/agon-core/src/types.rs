@@ -100,11 +100,13 @@ pub fn json_to_py(py: Python<'_>, value: &JsonValue) -> PyResult<Py<PyAny>> {
         }
         JsonValue::String(s) => Ok(s.into_pyobject(py)?.unbind().into_any()),
         JsonValue::Array(arr) => {
-            let list = PyList::empty(py);
-            for item in arr {
-                list.append(json_to_py(py, item)?)?;
-            }
-            Ok(list.unbind().into_any())
+            // Convert items first so the list is allocated once at its final
+            // size, rather than grown by repeated appends
+            let items = arr
+                .iter()
+                .map(|item| json_to_py(py, item))
+                .collect::<PyResult<Vec<_>>>()?;
+            Ok(PyList::new(py, items)?.unbind().into_any())
         }
         JsonValue::Object(map) => {
             let dict = PyDict::new(py);
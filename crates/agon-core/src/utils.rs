@@ -1,22 +1,145 @@
 //! Shared utilities for AGON encoding
 
+use rayon::prelude::*;
+use rustc_hash::FxHashMap;
+use std::borrow::Cow;
 use std::collections::HashMap;
-use std::sync::{LazyLock, RwLock};
+use std::fmt::{self, Write};
+use std::hash::{BuildHasher, RandomState};
+use std::sync::{Arc, LazyLock, RwLock};
 use tiktoken_rs::CoreBPE;
 
 use crate::error::{AgonError, Result};
 
+/// Pre-built run of spaces backing `indent` (32 levels of two-space indentation)
+const INDENT_SPACES: &str = "                                                                ";
+
+/// Indentation for a nesting depth, two spaces per level
+///
+/// Borrows from a static string for all realistic depths so the encoders
+/// don't allocate a fresh indent on every call.
+pub fn indent(depth: usize) -> Cow<'static, str> {
+    match INDENT_SPACES.get(..depth * 2) {
+        Some(spaces) => Cow::Borrowed(spaces),
+        None => Cow::Owned("  ".repeat(depth)),
+    }
+}
+
+/// Newline-separated output buffer for the line-oriented encoders
+///
+/// Lines are written straight into one growing `String`, rather than
+/// collected as a `Vec<String>` and joined at the end.
+#[derive(Debug, Default)]
+pub struct LineWriter {
+    buf: String,
+    lines: usize,
+}
+
+impl LineWriter {
+    pub fn new() -> Self {
+        Self::default()
+    }
+
+    /// Start a new line and return the buffer to write its contents into
+    pub fn line(&mut self) -> &mut String {
+        if self.lines > 0 {
+            self.buf.push('\n');
+        }
+        self.lines += 1;
+        &mut self.buf
+    }
+
+    /// Append a complete line
+    pub fn push(&mut self, line: &str) {
+        self.line().push_str(line);
+    }
+
+    /// Append a line built from `format_args!`, without an intermediate String
+    pub fn push_fmt(&mut self, args: fmt::Arguments<'_>) {
+        // Writing into a String cannot fail
+        let _ = self.line().write_fmt(args);
+    }
+
+    /// Finish writing and return the joined text
+    pub fn into_string(self) -> String {
+        self.buf
+    }
+}
+
+/// Classify a JSON number literal: `-?(0|[1-9][0-9]*)(\.[0-9]+)?([eE][+-]?[0-9]+)?`
+///
+/// Returns `Some(true)` for integers, `Some(false)` for literals with a
+/// fraction or exponent, and `None` if `s` is not a number literal. This is
+/// a byte scan, so number-heavy payloads avoid a regex match per cell.
+pub fn scan_number(s: &str) -> Option<bool> {
+    let b = s.as_bytes();
+    let digits_from = |mut i: usize| {
+        while b.get(i).is_some_and(u8::is_ascii_digit) {
+            i += 1;
+        }
+        i
+    };
+
+    let mut i = usize::from(b.first() == Some(&b'-'));
+    i = match b.get(i) {
+        Some(b'0') => i + 1,
+        Some(b'1'..=b'9') => digits_from(i + 1),
+        _ => return None,
+    };
+
+    let mut integer = true;
+    if b.get(i) == Some(&b'.') {
+        let end = digits_from(i + 1);
+        if end == i + 1 {
+            return None;
+        }
+        integer = false;
+        i = end;
+    }
+    if matches!(b.get(i), Some(b'e' | b'E')) {
+        i += 1;
+        if matches!(b.get(i), Some(b'+' | b'-')) {
+            i += 1;
+        }
+        let end = digits_from(i);
+        if end == i {
+            return None;
+        }
+        integer = false;
+        i = end;
+    }
+
+    (i == b.len()).then_some(integer)
+}
+
+/// Quick reject for `str::parse::<f64>` (and so `str::parse::<i64>`)
+///
+/// Returns `false` only when the parse is certain to fail: after an optional
+/// sign, every f64 literal starts with a digit, `.`, or the `inf`/`nan`
+/// keywords. Lets the quoting checks skip the parse for ordinary words.
+pub fn may_parse_float(s: &str) -> bool {
+    let b = s.as_bytes();
+    let first = match b.first() {
+        Some(b'+' | b'-') => b.get(1),
+        other => other,
+    };
+    matches!(first, Some(b'0'..=b'9' | b'.' | b'i' | b'I' | b'n' | b'N'))
+}
+
 /// Cached tokenizer instances by encoding name
-static TOKENIZERS: LazyLock<RwLock<HashMap<String, CoreBPE>>> =
+///
+/// Shared behind `Arc` so a cache hit is a refcount bump rather than a deep
+/// copy of the BPE rank tables.
+static TOKENIZERS: LazyLock<RwLock<HashMap<String, Arc<CoreBPE>>>> =
     LazyLock::new(|| RwLock::new(HashMap::new()));
 
 /// Get or create a tokenizer for the given encoding
-fn get_tokenizer(encoding: &str) -> Result<CoreBPE> {
+fn get_tokenizer(encoding: &str) -> Result<Arc<CoreBPE>> {
     // Check cache first
     {
         let cache = TOKENIZERS.read().unwrap();
         if let Some(tokenizer) = cache.get(encoding) {
-            return Ok(tokenizer.clone());
+            return Ok(Arc::clone(tokenizer));
         }
     }
 
@@ -37,26 +160,139 @@ fn get_tokenizer(encoding: &str) -> Result<CoreBPE> {
     }
     .map_err(|e| AgonError::EncodingError(e.to_string()))?;
 
-    // Cache it
-    {
-        let mut cache = TOKENIZERS.write().unwrap();
-        cache.insert(encoding.to_string(), tokenizer.clone());
+    // Cache it, keeping the first instance if another thread raced us here
+    let mut cache = TOKENIZERS.write().unwrap();
+    let tokenizer = cache
+        .entry(encoding.to_string())
+        .or_insert_with(|| Arc::new(tokenizer));
+    Ok(Arc::clone(tokenizer))
+}
+
+/// Soft cap on memoized token counts; half the entries are dropped when reached
+const TOKEN_CACHE_CAP: usize = 100_000;
+
+/// Memoized token counts keyed by a hash of `(encoding, text)`
+///
+/// The hasher is randomly seeded per process, so keys are 64-bit SipHash
+/// digests rather than copies of the (often large) encoded texts.
+struct TokenCounts {
+    hasher: RandomState,
+    counts: RwLock<FxHashMap<u64, usize>>,
+}
+
+static TOKEN_COUNTS: LazyLock<TokenCounts> = LazyLock::new(|| TokenCounts {
+    hasher: RandomState::new(),
+    counts: RwLock::new(FxHashMap::default()),
+});
+
+/// Count tokens with `tokenizer`, reusing the count from an earlier call on the same text
+fn count_cached(tokenizer: &CoreBPE, encoding: &str, text: &str) -> usize {
+    let key = TOKEN_COUNTS.hasher.hash_one((encoding, text));
+    if let Some(&count) = TOKEN_COUNTS.counts.read().unwrap().get(&key) {
+        return count;
     }
 
-    Ok(tokenizer)
+    let count = tokenizer.encode_ordinary(text).len();
+    let mut counts = TOKEN_COUNTS.counts.write().unwrap();
+    if counts.len() >= TOKEN_CACHE_CAP {
+        let mut keep = false;
+        counts.retain(|_, _| {
+            keep = !keep;
+            keep
+        });
+    }
+    counts.insert(key, count);
+    count
 }
 
 /// Count tokens using the specified tiktoken encoding
-/// Note: This is expensive (~1ms per 10KB). Use only when exact count is needed.
+/// Note: This is expensive (~1ms per 10KB) on first sight of a text; repeat
+/// counts of the same text are served from a cache.
 pub fn count_tokens(text: &str, encoding: &str) -> Result<usize> {
     let tokenizer = get_tokenizer(encoding)?;
-    Ok(tokenizer.encode_ordinary(text).len())
+    Ok(count_cached(&tokenizer, encoding, text))
+}
+
+/// Count tokens for several texts, resolving the tokenizer only once
+///
+/// Texts are tokenized in parallel on the rayon pool; counts keep input order.
+pub fn count_tokens_batch(texts: &[&str], encoding: &str) -> Result<Vec<usize>> {
+    let tokenizer = get_tokenizer(encoding)?;
+    Ok(texts
+        .par_iter()
+        .map(|text| count_cached(&tokenizer, encoding, text))
+        .collect())
 }
 
 #[cfg(test)]
 mod tests {
     use super::*;
 
+    #[test]
+    fn test_indent() {
+        assert_eq!(indent(0), "");
+        assert_eq!(indent(1), "  ");
+        assert_eq!(indent(3), "      ");
+        assert!(matches!(indent(32), Cow::Borrowed(_)));
+        assert_eq!(indent(40), "  ".repeat(40));
+    }
+
+    #[test]
+    fn test_line_writer_matches_join() {
+        let mut w = LineWriter::new();
+        w.push("@AGON rows");
+        w.push("");
+        w.push_fmt(format_args!("{}: {}", "a", 1));
+        w.line().push_str("tail");
+        assert_eq!(
+            w.into_string(),
+            ["@AGON rows", "", "a: 1", "tail"].join("\n")
+        );
+
+        assert_eq!(LineWriter::new().into_string(), "");
+        let mut w = LineWriter::new();
+        w.push("");
+        w.push("");
+        assert_eq!(w.into_string(), "\n");
+    }
+
+    #[test]
+    fn test_scan_number() {
+        assert_eq!(scan_number("0"), Some(true));
+        assert_eq!(scan_number("-42"), Some(true));
+        assert_eq!(scan_number("3.14"), Some(false));
+        assert_eq!(scan_number("-1e5"), Some(false));
+        assert_eq!(scan_number("2.5E-3"), Some(false));
+        for s in [
+            "", "-", "007", "+1", "1.", ".5", "1e", "1e+", "0x1f", "1 ", "inf", "١٢",
+        ] {
+            assert_eq!(scan_number(s), None, "{:?}", s);
+        }
+    }
+
+    #[test]
+    fn test_may_parse_float_never_rejects_a_parsable_float() {
+        for s in [
+            "0",
+            "+1",
+            "-2",
+            ".5",
+            "1e5",
+            "inf",
+            "-Infinity",
+            "NaN",
+            "+nan",
+            "007",
+        ] {
+            assert!(s.parse::<f64>().is_ok(), "{:?}", s);
+            assert!(may_parse_float(s), "{:?}", s);
+        }
+        for s in ["", "+", "hello", "e5", "x1", "true", "١٢"] {
+            assert!(!may_parse_float(s), "{:?}", s);
+            assert!(s.parse::<f64>().is_err(), "{:?}", s);
+        }
+    }
+
     #[test]
     fn test_count_tokens() {
         assert!(count_tokens("hello world", "o200k_base").unwrap() > 0);
@@ -67,8 +303,41 @@ mod tests {
         assert_eq!(count_tokens("", "o200k_base").unwrap(), 0);
     }
 
+    #[test]
+    fn test_get_tokenizer_shares_cached_instance() {
+        let first = get_tokenizer("cl100k_base").unwrap();
+        let second = get_tokenizer("cl100k_base").unwrap();
+        assert!(Arc::ptr_eq(&first, &second));
+    }
+
+    #[test]
+    fn test_count_tokens_repeat_uses_cache() {
+        let text = "a payload that is counted more than once";
+        let first = count_tokens(text, "o200k_base").unwrap();
+        let key = TOKEN_COUNTS.hasher.hash_one(("o200k_base", text));
+        assert_eq!(TOKEN_COUNTS.counts.read().unwrap().get(&key), Some(&first));
+        assert_eq!(count_tokens(text, "o200k_base").unwrap(), first);
+        assert_eq!(count_tokens_batch(&[text], "o200k_base").unwrap(), [first]);
+    }
+
     #[test]
     fn test_count_tokens_invalid_encoding() {
         assert!(count_tokens("hello", "invalid_encoding").is_err());
     }
+
+    #[test]
+    fn test_count_tokens_batch_matches_single() {
+        let texts = ["hello world", "", "a longer piece of text"];
+        let counts = count_tokens_batch(&texts, "o200k_base").unwrap();
+        let expected: Vec<usize> = texts
+            .iter()
+            .map(|t| count_tokens(t, "o200k_base").unwrap())
+            .collect();
+        assert_eq!(counts, expected);
+    }
+
+    #[test]
+    fn test_count_tokens_batch_invalid_encoding() {
+        assert!(count_tokens_batch(&["hello"], "invalid_encoding").is_err());
+    }
 }
@@ -1,5 +1,7 @@
 """Nox sessions for AGON."""
 
+import os
+
 import nox
 
 PYTHON_VERSIONS = ["3.11", "3.12", "3.13"]
@@ -21,11 +23,16 @@ def lint(session: nox.Session) -> None:
 @nox.session(python=PYTHON_VERSIONS)
 def unit(session: nox.Session) -> None:
     """Run unit tests."""
-    session.install(".", "pytest", "pytest-cov", "pytest-sugar", "pytest-xdist", "tiktoken")
+    session.install(
+        ".", "pytest", "pytest-cov", "pytest-sugar", "pytest-xdist", "hypothesis", "tiktoken"
+    )
+    # Slow cases run only when asked for (nightly CI sets AGON_FULL_TESTS)
+    selection = [] if os.environ.get("AGON_FULL_TESTS") else ["-m", "not slow"]
     session.run(
         "pytest",
         "--cov=agon",
         "--cov-report=term-missing",
+        *selection,
         *session.posargs,
     )
 
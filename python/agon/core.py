@@ -6,11 +6,12 @@ encoding for lists of JSON objects, optimized for LLM consumption.
 
 from __future__ import annotations
 
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from typing import TYPE_CHECKING, Any, ClassVar, Literal, cast, overload
 
 if TYPE_CHECKING:
-    from collections.abc import Callable  # pragma: no cover
+    from collections.abc import Callable, Iterable  # pragma: no cover
 
 import orjson
 
@@ -34,8 +35,16 @@ Encoding = Literal[
     "r50k_base",  # GPT-3 (davinci, curie, babbage, ada)
 ]
 
+# Generation hints depend only on the format, so build them once at import
+_HINTS: dict[str, str] = {
+    "rows": AGONRows.hint(),
+    "columns": AGONColumns.hint(),
+    "struct": AGONStruct.hint(),
+    "json": "JSON: Standard compact JSON encoding",
+}
 
-@dataclass(frozen=True)
+
+@dataclass(frozen=True, slots=True)
 class AGONEncoding:
     r"""Result of AGON encoding with format metadata.
 
@@ -87,18 +96,11 @@ class AGONEncoding:
             >>> result.hint()
             'Return in AGON rows format: Start with @AGON rows header...'
         """
-        match self.format:
-            case "rows":
-                return AGONRows.hint()
-            case "columns":
-                return AGONColumns.hint()
-            case "struct":
-                return AGONStruct.hint()
-            case "json":
-                return "JSON: Standard compact JSON encoding"
-            case _:
-                msg = f"Unknown format: {self.format}"
-                raise AGONError(msg)
+        try:
+            return _HINTS[self.format]
+        except KeyError:
+            msg = f"Unknown format: {self.format}"
+            raise AGONError(msg) from None
 
 
 class AGON:
@@ -128,19 +130,24 @@ class AGON:
         "struct": "@AGON struct",
     }
 
-    # Encoders - Rust for AGON formats, orjson for JSON
-    _encoders: ClassVar[dict[ConcreteFormat, Callable[[Any], str]]] = {
-        "json": lambda data: orjson.dumps(data).decode(),
-        "rows": lambda data: str(AGONRows.encode(data, include_header=False)),
-        "columns": lambda data: str(AGONColumns.encode(data, include_header=False)),
-        "struct": lambda data: str(AGONStruct.encode(data, include_header=False)),
+    # Header + blank separator line, prepended when decoding headerless text
+    _prefixes: ClassVar[dict[ConcreteFormat, str]] = {
+        fmt: f"{header}\n\n" for fmt, header in _headers.items()
     }
 
-    # Decoders - Rust for AGON formats
+    # Rust encoder and header per AGON format, so direct dispatch is a single lookup
+    # (encoders are headerless by default and return str; JSON is handled inline)
+    _encoders: ClassVar[dict[ConcreteFormat, tuple[Callable[[Any], str], str]]] = {
+        "rows": (AGONRows.encode, _headers["rows"]),
+        "columns": (AGONColumns.encode, _headers["columns"]),
+        "struct": (AGONStruct.encode, _headers["struct"]),
+    }
+
+    # Decoders - Rust for AGON formats, keyed by the name in the "@AGON <name>" header
     _decoders: ClassVar[dict[str, Callable[[str], Any]]] = {
-        "@AGON rows": AGONRows.decode,
-        "@AGON columns": AGONColumns.decode,
-        "@AGON struct": AGONStruct.decode,
+        "rows": AGONRows.decode,
+        "columns": AGONColumns.decode,
+        "struct": AGONStruct.decode,
     }
 
     @staticmethod
@@ -180,12 +187,14 @@ class AGON:
             >>> response = send_to_llm(f"Analyze: {result}")  # uses __str__
             >>> AGON.decode(response, result)  # decode using same format
         """
+        # JSON passthrough: skip the encoder table and lambda frame
+        if format == "json":
+            return AGONEncoding("json", orjson.dumps(data).decode(), "")
+
         # Direct format dispatch
         if format != "auto":
-            encoder = AGON._encoders[format]
-            text = encoder(data)
-            header = AGON._headers[format]
-            return AGONEncoding(format, text, header)
+            encoder, header = AGON._encoders[format]
+            return AGONEncoding(format, encoder(data), header)
 
         # format == "auto": use Rust for fast parallel encoding and format selection
         # encoding=None means use fast byte-length estimate, otherwise use specified tiktoken encoding
@@ -194,17 +203,58 @@ class AGON:
         header = AGON._headers[selected_format]
         return AGONEncoding(selected_format, result.text, header)
 
+    @staticmethod
+    def encode_many(
+        datasets: Iterable[object],
+        *,
+        format: Format = "auto",
+        force: bool = False,
+        min_savings: float = 0.10,
+        encoding: Encoding | None = None,
+        workers: int | None = None,
+    ) -> list[AGONEncoding]:
+        """Encode several independent datasets concurrently.
+
+        The Rust encoders release the GIL while encoding, so a thread pool
+        overlaps the work for large batches. Options match `encode` and apply
+        to every dataset.
+
+        Args:
+            datasets: Datasets to encode. Each must be JSON-serializable.
+            format: Format to use for every dataset (see `encode`).
+            force: If True with format="auto", always use a non-JSON format.
+            min_savings: Minimum token savings ratio vs JSON to use non-JSON format.
+            encoding: Tiktoken encoding for token counting (see `encode`).
+            workers: Maximum number of threads. Defaults to the executor default.
+
+        Returns:
+            One AGONEncoding per dataset, in input order.
+
+        Example:
+            >>> results = AGON.encode_many([users, orders], format="rows")
+            >>> [r.format for r in results]
+            ['rows', 'rows']
+        """
+
+        def encode_one(data: object) -> AGONEncoding:
+            return AGON.encode(
+                data, format=format, force=force, min_savings=min_savings, encoding=encoding
+            )
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            return list(pool.map(encode_one, datasets))
+
     @overload
     @staticmethod
     def decode(payload: AGONEncoding) -> Any: ...
 
     @overload
     @staticmethod
-    def decode(payload: str, format: Format | None = None) -> Any: ...
+    def decode(payload: str | bytes | bytearray, format: Format | None = None) -> Any: ...
 
     @staticmethod
     def decode(
-        payload: str | AGONEncoding,
+        payload: str | bytes | bytearray | AGONEncoding,
         format: Format | None = None,
     ) -> Any:
         """Decode an AGON-encoded payload.
@@ -213,7 +263,9 @@ class AGON:
             payload: What to decode. Can be:
                 - AGONEncoding: Decode using its text and format
                 - str: Encoded string (use format param or auto-detect)
-            format: Format to use (only for str payload). If None, auto-detects.
+                - bytes/bytearray: UTF-8 encoded string, e.g. a raw response
+                  body. JSON is parsed straight from the bytes.
+            format: Format to use (only for str/bytes payload). If None, auto-detects.
 
         Returns:
             Decoded Python value.
@@ -227,13 +279,26 @@ class AGON:
         """
         if isinstance(payload, AGONEncoding):
             format, payload = payload.format, payload.text
-
-        text = payload.strip()
-
-        # Auto-detect from header prefix
+        elif isinstance(payload, (bytes, bytearray)):
+            # orjson parses bytes natively; only the Rust decoders need a str
+            raw = payload.lstrip()
+            if format == "json" or (format in (None, "auto") and not raw.startswith(b"@AGON ")):
+                return AGON._decode_json(raw)
+            try:
+                payload = raw.decode()
+            except UnicodeDecodeError as e:
+                raise AGONError(f"Invalid UTF-8: {e}") from e
+
+        # Only the head matters for dispatch; decoders tolerate trailing whitespace
+        text = payload.lstrip()
+
+        # Auto-detect from the format name in the "@AGON <name>" header line
         if format is None or format == "auto":
-            for prefix, decoder in AGON._decoders.items():
-                if text.startswith(prefix):
+            if text.startswith("@AGON "):
+                end = text.find("\n", 6)
+                name = text[6:end] if end != -1 else text[6:]
+                decoder = AGON._decoders.get(name.rstrip())
+                if decoder is not None:
                     return decoder(text)
             return AGON._decode_json(text)
 
@@ -244,11 +309,11 @@ class AGON:
             case "rows" | "columns" | "struct":
                 header = AGON._headers[format]
                 if not text.startswith(header):
-                    text = f"{header}\n\n{text}"
-                return AGON._decoders[header](text)
+                    text = AGON._prefixes[format] + text
+                return AGON._decoders[format](text)
 
     @staticmethod
-    def _decode_json(text: str) -> object:
+    def _decode_json(text: str | bytes | bytearray) -> object:
         """Decode JSON text."""
         try:
             return orjson.loads(text)
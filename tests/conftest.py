@@ -4,18 +4,42 @@ from typing import Any
 
 import pytest
 
+from agon import AGON, AGONColumns, AGONEncoding
 
-@pytest.fixture
+SIMPLE_DATA: list[dict[str, Any]] = [
+    {"id": 1, "name": "Alice", "role": "admin"},
+    {"id": 2, "name": "Bob", "role": "user"},
+    {"id": 3, "name": "Charlie", "role": "user"},
+]
+
+
+# Data fixtures are module-scoped: tests only read them, never mutate them.
+@pytest.fixture(scope="module")
 def simple_data() -> list[dict[str, Any]]:
     """Simple test data with basic fields."""
-    return [
-        {"id": 1, "name": "Alice", "role": "admin"},
-        {"id": 2, "name": "Bob", "role": "user"},
-        {"id": 3, "name": "Charlie", "role": "user"},
-    ]
+    return [dict(row) for row in SIMPLE_DATA]
+
+
+@pytest.fixture(scope="session")
+def encoded_simple_data() -> str:
+    """Simple test data encoded once per session as AGONColumns, with header."""
+    return AGONColumns.encode(SIMPLE_DATA, include_header=True)
+
 
+@pytest.fixture(scope="session")
+def uniform_records() -> list[dict[str, Any]]:
+    """Sixty same-shape records, long enough for AGON formats to beat JSON."""
+    return [{"id": i, "name": "Alice"} for i in range(60)]
 
-@pytest.fixture
+
+@pytest.fixture(scope="session")
+def encoded_by_format() -> dict[str, AGONEncoding]:
+    """SIMPLE_DATA encoded once per session in each concrete format."""
+    formats = ("rows", "columns", "struct", "json")
+    return {fmt: AGON.encode(SIMPLE_DATA, format=fmt) for fmt in formats}
+
+
+@pytest.fixture(scope="module")
 def nested_data() -> list[dict[str, Any]]:
     """Test data with nested objects."""
     return [
@@ -24,7 +48,7 @@ def nested_data() -> list[dict[str, Any]]:
     ]
 
 
-@pytest.fixture
+@pytest.fixture(scope="module")
 def list_data() -> list[dict[str, Any]]:
     """Test data with nested lists."""
     return [
@@ -33,7 +57,7 @@ def list_data() -> list[dict[str, Any]]:
     ]
 
 
-@pytest.fixture
+@pytest.fixture(scope="module")
 def data_with_nulls() -> list[dict[str, Any]]:
     """Test data with explicit nulls and missing fields."""
     return [
@@ -41,3 +65,14 @@ def data_with_nulls() -> list[dict[str, Any]]:
         {"id": 2, "name": "Bob"},  # Missing role
         {"id": 3},  # Missing name and role
     ]
+
+
+@pytest.fixture(scope="session", autouse=True)
+def _prewarm_tokenizers() -> None:
+    """Load the tiktoken tables the suite uses once, before any test runs.
+
+    The extension keeps each tokenizer for the life of the process, so the
+    first count pays the BPE load here instead of inside a timed test.
+    """
+    for encoding in ("o200k_base", "cl100k_base"):
+        AGON.count_tokens("", encoding=encoding)
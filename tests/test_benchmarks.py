@@ -4,6 +4,7 @@ Tests token efficiency, data integrity, and type safety with large datasets.
 Results are printed to stdout
 """
 
+from functools import cache
 from pathlib import Path
 import time
 from typing import Any
@@ -17,17 +18,22 @@ from agon import AGON
 # Path to test data
 DATA_DIR = Path(__file__).parent / "data"
 
-# Tiktoken encoder for token counting
-ENCODER = tiktoken.get_encoding("o200k_base")
 
+@cache
+def get_encoder(name: str = "o200k_base") -> tiktoken.Encoding:
+    """Tiktoken encoder for token counting, loaded on first use and then shared."""
+    return tiktoken.get_encoding(name)
 
-def count_tokens(text: str) -> int:
-    """Count tokens in a string using tiktoken."""
-    return len(ENCODER.encode(text))
 
+def count_tokens_batch(texts: list[str]) -> list[int]:
+    """Count tokens for several strings in one parallel tiktoken call."""
+    encoder = get_encoder()
+    return [len(tokens) for tokens in encoder.encode_batch(texts, num_threads=len(texts))]
 
+
+@cache
 def load_json(filename: str) -> Any:
-    """Load JSON file from test data directory."""
+    """Load JSON file from test data directory, parsing each file once per session."""
     with open(DATA_DIR / filename, "rb") as f:
         return orjson.loads(f.read())
 
@@ -85,6 +91,15 @@ def normalize_floats(obj: Any, precision: int = 10) -> Any:
     return obj
 
 
+def roundtrips(decoded: Any, original: Any) -> bool:
+    """Compare decoded data to the original, normalizing floats only if needed.
+
+    Exact equality is the common case and compares in C, so the recursive
+    normalize_floats walk only runs when some float differs in its last bits.
+    """
+    return decoded == original or normalize_floats(decoded) == normalize_floats(original)
+
+
 @pytest.mark.parametrize(
     "fixture_path",
     iter_json_fixtures(),
@@ -97,42 +112,31 @@ def test_fixture_benchmark(fixture_path: Path) -> None:
 
     # Use pretty JSON as baseline (more realistic comparison)
     raw_json = orjson.dumps(records, option=orjson.OPT_INDENT_2).decode()
-    raw_tokens = count_tokens(raw_json)
-
-    # Test compact JSON (baseline for comparison table)
-    compact_json = orjson.dumps(records).decode()
-    compact_tokens = count_tokens(compact_json)
 
+    # Test compact JSON (baseline for comparison table); serialize once and
+    # reuse the bytes for the timed decode and the token count
     t0 = time.perf_counter()
-    orjson.dumps(records)
+    compact_bytes = orjson.dumps(records)
     compact_encode_ms = (time.perf_counter() - t0) * 1000
+    compact_json = compact_bytes.decode()
 
     t0 = time.perf_counter()
-    orjson.loads(orjson.dumps(records))
+    orjson.loads(compact_bytes)
     compact_decode_ms = (time.perf_counter() - t0) * 1000
 
-    # Calculate compact JSON savings vs pretty JSON
-    compact_savings = (1 - compact_tokens / max(1, raw_tokens)) * 100
-
-    # Test each format individually
-    format_results: dict[
-        str, tuple[int, float, float, float]
-    ] = {}  # tokens, savings, encode_ms, decode_ms
-
-    # Add compact JSON as baseline
-    format_results["json"] = (compact_tokens, compact_savings, compact_encode_ms, compact_decode_ms)
+    # Encoded text and timings per format; tokens are counted in one batch below
+    format_runs: dict[str, tuple[str, float, float]] = {
+        "json": (compact_json, compact_encode_ms, compact_decode_ms)
+    }
 
     for fmt, encoder, decoder in [
         ("rows", lambda data: AGON.encode(data, format="rows"), AGON.decode),  # type: ignore[misc]
         ("columns", lambda data: AGON.encode(data, format="columns"), AGON.decode),  # type: ignore[misc]
         ("struct", lambda data: AGON.encode(data, format="struct"), AGON.decode),  # type: ignore[misc]
     ]:
-        encoded = encoder(records)
-        tokens = count_tokens(encoded.text)
-        savings = (1 - tokens / max(1, raw_tokens)) * 100
-
+        # Time the encode whose output is decoded and tokenized below
         t0 = time.perf_counter()
-        encoder(records)
+        encoded = encoder(records)
         encode_ms = (time.perf_counter() - t0) * 1000
 
         t0 = time.perf_counter()
@@ -140,22 +144,34 @@ def test_fixture_benchmark(fixture_path: Path) -> None:
         decode_ms = (time.perf_counter() - t0) * 1000
 
         # Verify roundtrip
-        assert normalize_floats(decoded) == normalize_floats(records), f"{fmt} roundtrip failed"
+        assert roundtrips(decoded, records), f"{fmt} roundtrip failed"
 
-        format_results[fmt] = (tokens, savings, encode_ms, decode_ms)
+        format_runs[fmt] = (encoded.text, encode_ms, decode_ms)
 
     # Test auto selection with timing
     t0 = time.perf_counter()
     result = AGON.encode(records, format="auto")
     auto_encode_ms = (time.perf_counter() - t0) * 1000
-    auto_tokens = count_tokens(result.text)
-    auto_savings = (1 - auto_tokens / max(1, raw_tokens)) * 100
 
     # Verify auto decode (decode AGONEncoding directly)
     t0 = time.perf_counter()
     decoded = AGON.decode(result)
     auto_decode_ms = (time.perf_counter() - t0) * 1000
-    assert normalize_floats(decoded) == normalize_floats(records), "auto roundtrip failed"
+    assert roundtrips(decoded, records), "auto roundtrip failed"
+
+    # Count tokens for the baseline, every format, and auto in a single batch
+    texts = [raw_json, *(text for text, _, _ in format_runs.values()), result.text]
+    raw_tokens, *format_tokens, auto_tokens = count_tokens_batch(texts)
+    auto_savings = (1 - auto_tokens / max(1, raw_tokens)) * 100
+
+    format_results: dict[
+        str, tuple[int, float, float, float]
+    ] = {}  # tokens, savings, encode_ms, decode_ms
+    for (fmt, (_, encode_ms, decode_ms)), tokens in zip(
+        format_runs.items(), format_tokens, strict=True
+    ):
+        savings = (1 - tokens / max(1, raw_tokens)) * 100
+        format_results[fmt] = (tokens, savings, encode_ms, decode_ms)
 
     # Print results
     record_count = len(records) if isinstance(records, list) else 1
@@ -5,24 +5,130 @@ Tests encoding and decoding of the columnar format optimized for wide tables.
 
 from __future__ import annotations
 
-import textwrap
+from functools import cache
+import re
+from types import SimpleNamespace
 from typing import Any
 
+from hypothesis import given, settings
+from hypothesis import strategies as st
 import pytest
 
-from agon import AGON, AGONColumns
+from agon import AGON, AGONColumns, AGONEncoding
+import agon.core as agon_core
+
+# Static decode payloads, built once at import rather than per test
+_PAYLOAD_COLUMNAR = (
+    "@AGON columns\n"
+    "\n"
+    "products[3]\n"
+    "├ sku: A123\tB456\tC789\n"
+    "├ name: Widget\tGadget\tGizmo\n"
+    "└ price: 9.99\t19.99\t29.99\n"
+)
+
+_PAYLOAD_COLUMNAR_UNNAMED = (
+    "@AGON columns\n"
+    "\n"
+    "[3]\n"
+    "├ sku: A123\tB456\tC789\n"
+    "├ name: Widget\tGadget\tGizmo\n"
+    "└ price: 9.99\t19.99\t29.99\n"
+)
+
+_PAYLOAD_MISSING_VALUES = (
+    "@AGON columns\n"
+    "\n"
+    "users[3]\n"
+    "├ id: 1\t2\t3\n"
+    "├ name: Alice\tBob\tCarol\n"
+    "└ email: alice@example.com\t\tcarol@example.com\n"
+)
+
+# Expected decodes of the payloads above, compared as whole lists
+_EXPECTED_PRODUCTS = [
+    {"sku": "A123", "name": "Widget", "price": 9.99},
+    {"sku": "B456", "name": "Gadget", "price": 19.99},
+    {"sku": "C789", "name": "Gizmo", "price": 29.99},
+]
+
+_EXPECTED_USERS = [
+    {"id": 1, "name": "Alice", "email": "alice@example.com"},
+    {"id": 2, "name": "Bob"},
+    {"id": 3, "name": "Carol", "email": "carol@example.com"},
+]
+
+_PAYLOAD_LIST_OBJECTS = (
+    "@AGON columns\n\nrecords[2]:\n  - name: Alice\n    age: 30\n  - name: Bob\n    age: 25\n"
+)
+
+_PAYLOAD_LIST_PRIMITIVES = '@AGON columns\n\nitems[3]:\n  - 1\n  - null\n  - "x"\n'
+
+_PAYLOAD_PRIMITIVES = "@AGON columns\n\nvalue: 42\nname: Alice\nactive: true\nmissing: null\n"
+
+# Decode error messages, compiled once for pytest.raises(match=...)
+_RE_INVALID_HEADER = re.compile("Invalid header")
+_RE_EMPTY_PAYLOAD = re.compile("Empty payload")
+
+# Roundtrip domain for the property test. Table rows may omit any key, but
+# a table whose rows are all empty objects is left out: it has no columns and
+# decodes as an empty list (pinned by test_roundtrip_table_of_empty_objects).
+_KEYS = st.from_regex(r"[a-z][a-z0-9_]{0,7}", fullmatch=True)
+_TEXT = st.text(st.characters(codec="utf-8", exclude_categories=("Cs",)), max_size=20)
+_SCALARS = st.one_of(
+    st.none(),
+    st.booleans(),
+    st.integers(min_value=-(2**53), max_value=2**53),
+    st.floats(allow_nan=False, allow_infinity=False),
+    _TEXT,
+)
+_TABLES = st.lists(_KEYS, min_size=1, max_size=8, unique=True).flatmap(
+    lambda keys: st.lists(
+        st.fixed_dictionaries({}, optional=dict.fromkeys(keys, _SCALARS)), min_size=1, max_size=8
+    ).filter(any)
+)
+_VALUES = st.recursive(
+    _SCALARS | st.lists(_SCALARS, min_size=1, max_size=5) | _TABLES,
+    lambda children: st.dictionaries(_KEYS, children, min_size=1, max_size=4),
+    max_leaves=12,
+)
+_DOCUMENTS = _TABLES | st.dictionaries(_KEYS, _VALUES, min_size=1, max_size=5)
+
+
+@cache
+def _needle_pattern(needles: frozenset[str]) -> re.Pattern[str]:
+    """Compiled alternation of literal needles, longest first."""
+    return re.compile("|".join(map(re.escape, sorted(needles, key=len, reverse=True))))
+
+
+def assert_contains_all(text: str, needles: list[str]) -> None:
+    """Assert every needle occurs in text, scanning it once for all of them.
+
+    Matches are non-overlapping, so needles hidden inside another match are
+    rechecked individually before being reported missing.
+    """
+    found = set(_needle_pattern(frozenset(needles)).findall(text))
+    missing = [n for n in needles if n not in found and n not in text]
+    assert not missing, f"missing {missing!r} in {text!r}"
+
+
+def _tree_chars(encoded: str) -> set[str]:
+    """First character of each non-empty line, where column tree markers sit."""
+    return {line.lstrip()[:1] for line in encoded.splitlines() if line.strip()}
 
 
 class TestAGONColumnsBasic:
     """Basic encoding/decoding tests."""
 
+    def test_encoded_output_starts_with_header(self) -> None:
+        encoded = AGONColumns.encode({"name": "Alice"}, include_header=True)
+        assert encoded.startswith("@AGON columns\n")
+        assert not AGONColumns.encode({"name": "Alice"}).startswith("@AGON")
+
     def test_encode_simple_object(self) -> None:
         data = {"name": "Alice", "age": 30, "active": True}
         encoded = AGONColumns.encode(data, include_header=True)
-        assert "@AGON columns" in encoded
-        assert "name: Alice" in encoded
-        assert "age: 30" in encoded
-        assert "active: true" in encoded
+        assert_contains_all(encoded, ["name: Alice", "age: 30", "active: true"])
 
     def test_encode_decode_roundtrip_simple(self) -> None:
         data = {"name": "Alice", "age": 30}
@@ -46,62 +152,27 @@ class TestAGONColumnsBasic:
 class TestAGONColumnsColumnar:
     """Tests for columnar array encoding (uniform objects)."""
 
-    def test_encode_columnar_array(self, simple_data: list[dict[str, Any]]) -> None:
-        encoded = AGONColumns.encode(simple_data, include_header=True)
+    def test_encode_columnar_array(self, encoded_simple_data: str) -> None:
+        encoded = encoded_simple_data
         assert "[3]" in encoded
-        assert "├" in encoded or "|" in encoded
-        assert "└" in encoded or "`" in encoded
+        tree_chars = _tree_chars(encoded)
+        assert tree_chars & {"├", "|"}
+        assert tree_chars & {"└", "`"}
 
     def test_decode_columnar_array(self) -> None:
-        payload = (
-            "@AGON columns\n"
-            "\n"
-            "products[3]\n"
-            "├ sku: A123\tB456\tC789\n"
-            "├ name: Widget\tGadget\tGizmo\n"
-            "└ price: 9.99\t19.99\t29.99\n"
-        )
+        payload = _PAYLOAD_COLUMNAR
         decoded = AGONColumns.decode(payload)
-        assert "products" in decoded
-        products = decoded["products"]
-        assert len(products) == 3
-        assert products[0] == {"sku": "A123", "name": "Widget", "price": 9.99}
-        assert products[1] == {"sku": "B456", "name": "Gadget", "price": 19.99}
-        assert products[2] == {"sku": "C789", "name": "Gizmo", "price": 29.99}
+        assert decoded == {"products": _EXPECTED_PRODUCTS}
 
     def test_decode_columnar_array_unnamed(self) -> None:
-        payload = (
-            "@AGON columns\n"
-            "\n"
-            "[3]\n"
-            "├ sku: A123\tB456\tC789\n"
-            "├ name: Widget\tGadget\tGizmo\n"
-            "└ price: 9.99\t19.99\t29.99\n"
-        )
+        payload = _PAYLOAD_COLUMNAR_UNNAMED
         decoded = AGONColumns.decode(payload)
-        assert len(decoded) == 3
-        assert decoded[0] == {"sku": "A123", "name": "Widget", "price": 9.99}
-
-    def test_roundtrip_columnar_array(self, simple_data: list[dict[str, Any]]) -> None:
-        encoded = AGONColumns.encode(simple_data, include_header=True)
-        decoded = AGONColumns.decode(encoded)
-        assert decoded == simple_data
+        assert decoded == _EXPECTED_PRODUCTS
 
     def test_columnar_with_missing_values(self) -> None:
-        payload = (
-            "@AGON columns\n"
-            "\n"
-            "users[3]\n"
-            "├ id: 1\t2\t3\n"
-            "├ name: Alice\tBob\tCarol\n"
-            "└ email: alice@example.com\t\tcarol@example.com\n"
-        )
+        payload = _PAYLOAD_MISSING_VALUES
         decoded = AGONColumns.decode(payload)
-        users = decoded["users"]
-        assert len(users) == 3
-        assert users[0] == {"id": 1, "name": "Alice", "email": "alice@example.com"}
-        assert users[1] == {"id": 2, "name": "Bob"}
-        assert users[2] == {"id": 3, "name": "Carol", "email": "carol@example.com"}
+        assert decoded == {"users": _EXPECTED_USERS}
 
     def test_decode_columnar_array_field_shorter_than_count(self) -> None:
         payload = "@AGON columns\n\nusers[2]\n└ id: 1\n"
@@ -146,12 +217,6 @@ class TestAGONColumnsPrimitiveArrays:
         decoded = AGONColumns.decode(payload)
         assert decoded == {"tags": ["admin", "ops", "dev", "user"]}
 
-    def test_roundtrip_primitive_array(self) -> None:
-        data = {"numbers": [1, 2, 3, 4, 5]}
-        encoded = AGONColumns.encode(data, include_header=True)
-        decoded = AGONColumns.decode(encoded)
-        assert decoded == data
-
 
 class TestAGONColumnsMixedArrays:
     """Tests for mixed-type array encoding (list format)."""
@@ -162,17 +227,7 @@ class TestAGONColumnsMixedArrays:
         assert "items[4]:" in encoded
 
     def test_decode_list_array_with_objects(self) -> None:
-        payload = textwrap.dedent(
-            """\
-            @AGON columns
-
-            records[2]:
-              - name: Alice
-                age: 30
-              - name: Bob
-                age: 25
-            """
-        )
+        payload = _PAYLOAD_LIST_OBJECTS
         decoded = AGONColumns.decode(payload)
         records = decoded["records"]
         assert len(records) == 2
@@ -180,16 +235,7 @@ class TestAGONColumnsMixedArrays:
         assert records[1] == {"name": "Bob", "age": 25}
 
     def test_decode_list_array_with_primitives(self) -> None:
-        payload = textwrap.dedent(
-            """\
-            @AGON columns
-
-            items[3]:
-              - 1
-              - null
-              - \"x\"
-            """
-        )
+        payload = _PAYLOAD_LIST_PRIMITIVES
         decoded = AGONColumns.decode(payload)
         assert decoded == {"items": [1, None, "x"]}
 
@@ -203,41 +249,31 @@ class TestAGONColumnsMixedArrays:
 class TestAGONColumnsPrimitives:
     """Tests for primitive value handling."""
 
-    def test_encode_null(self) -> None:
-        data = {"value": None}
+    @pytest.mark.parametrize(
+        ("data", "needles"),
+        [
+            pytest.param({"value": None}, ["value:"], id="null"),
+            pytest.param(
+                {"active": True, "deleted": False},
+                ["active: true", "deleted: false"],
+                id="booleans",
+            ),
+            pytest.param(
+                {"integer": 42, "float": 3.14, "negative": -17},
+                ["integer: 42", "float: 3.14", "negative: -17"],
+                id="numbers",
+            ),
+            pytest.param(
+                {"nan": float("nan"), "inf": float("inf")}, ["nan:", "inf:"], id="special_floats"
+            ),
+        ],
+    )
+    def test_encode_primitive(self, data: dict[str, Any], needles: list[str]) -> None:
         encoded = AGONColumns.encode(data, include_header=True)
-        assert "value:" in encoded
-
-    def test_encode_booleans(self) -> None:
-        data = {"active": True, "deleted": False}
-        encoded = AGONColumns.encode(data, include_header=True)
-        assert "active: true" in encoded
-        assert "deleted: false" in encoded
-
-    def test_encode_numbers(self) -> None:
-        data = {"integer": 42, "float": 3.14, "negative": -17}
-        encoded = AGONColumns.encode(data, include_header=True)
-        assert "integer: 42" in encoded
-        assert "float: 3.14" in encoded
-        assert "negative: -17" in encoded
-
-    def test_encode_special_floats(self) -> None:
-        data = {"nan": float("nan"), "inf": float("inf")}
-        encoded = AGONColumns.encode(data, include_header=True)
-        assert "nan:" in encoded
-        assert "inf:" in encoded
+        assert_contains_all(encoded, needles)
 
     def test_decode_primitives(self) -> None:
-        payload = textwrap.dedent(
-            """\
-            @AGON columns
-
-            value: 42
-            name: Alice
-            active: true
-            missing: null
-            """
-        )
+        payload = _PAYLOAD_PRIMITIVES
         decoded = AGONColumns.decode(payload)
         assert decoded == {"value": 42, "name": "Alice", "active": True, "missing": None}
 
@@ -245,26 +281,19 @@ class TestAGONColumnsPrimitives:
 class TestAGONColumnsQuoting:
     """Tests for string quoting rules."""
 
-    def test_quote_string_with_delimiter(self) -> None:
-        # Tab is the delimiter, so strings containing tabs need quoting
-        data = {"text": "hello\tworld"}
-        encoded = AGONColumns.encode(data, include_header=True)
-        assert '"hello\\tworld"' in encoded
-
-    def test_quote_string_with_leading_space(self) -> None:
-        data = {"text": " leading space"}
+    @pytest.mark.parametrize(
+        ("data", "quoted"),
+        [
+            # Tab is the delimiter, so strings containing tabs need quoting
+            pytest.param({"text": "hello\tworld"}, '"hello\\tworld"', id="delimiter"),
+            pytest.param({"text": " leading space"}, '" leading space"', id="leading_space"),
+            pytest.param({"tag": "@mention"}, '"@mention"', id="special_char"),
+            pytest.param({"code": "42"}, '"42"', id="looks_like_number"),
+        ],
+    )
+    def test_quote_string(self, data: dict[str, str], quoted: str) -> None:
         encoded = AGONColumns.encode(data, include_header=True)
-        assert '" leading space"' in encoded
-
-    def test_quote_string_with_special_char(self) -> None:
-        data = {"tag": "@mention"}
-        encoded = AGONColumns.encode(data, include_header=True)
-        assert '"@mention"' in encoded
-
-    def test_quote_string_looks_like_number(self) -> None:
-        data = {"code": "42"}
-        encoded = AGONColumns.encode(data, include_header=True)
-        assert '"42"' in encoded
+        assert quoted in encoded
 
     def test_roundtrip_quoted_strings(self) -> None:
         data = {"text": 'Say "hello"', "path": "C:\\Users"}
@@ -273,29 +302,6 @@ class TestAGONColumnsQuoting:
         assert decoded == data
 
 
-class TestAGONColumnsNesting:
-    """Tests for nested structures."""
-
-    def test_nested_object(self) -> None:
-        data = {
-            "company": {
-                "name": "ACME",
-                "address": {
-                    "street": "123 Main St",
-                    "city": "Seattle",
-                },
-            },
-        }
-        encoded = AGONColumns.encode(data, include_header=True)
-        decoded = AGONColumns.decode(encoded)
-        assert decoded == data
-
-    def test_array_inside_object(self, nested_data: list[dict[str, Any]]) -> None:
-        encoded = AGONColumns.encode(nested_data, include_header=True)
-        decoded = AGONColumns.decode(encoded)
-        assert decoded == nested_data
-
-
 class TestAGONColumnsEmptyAndStrings:
     """Tests for empty values and string handling."""
 
@@ -312,33 +318,40 @@ class TestAGONColumnsEmptyAndStrings:
         decoded = AGONColumns.decode(encoded)
         assert decoded == {} or decoded is None
 
-    def test_single_element_array(self) -> None:
-        data = [{"id": 1, "name": "Only"}]
-        encoded = AGONColumns.encode(data, include_header=True)
-        decoded = AGONColumns.decode(encoded)
-        assert decoded == data
-
+    @pytest.mark.slow
     def test_long_string(self) -> None:
         data = {"text": "x" * 1000}
         encoded = AGONColumns.encode(data, include_header=True)
         decoded = AGONColumns.decode(encoded)
         assert decoded == data
 
-    def test_unicode_string(self) -> None:
-        data = {"text": "Hello 世界 🌍"}
+
+class TestAGONColumnsProperties:
+    """Property-based roundtrip tests."""
+
+    @settings(max_examples=25, deadline=None)
+    @given(_DOCUMENTS)
+    def test_roundtrip(self, data: Any) -> None:
         encoded = AGONColumns.encode(data, include_header=True)
-        decoded = AGONColumns.decode(encoded)
-        assert decoded == data
+        assert AGONColumns.decode(encoded) == data
 
-    def test_wide_table(self) -> None:
-        """Test with many columns (columnar format's strength)."""
-        data = [
-            {"a": 1, "b": 2, "c": 3, "d": 4, "e": 5, "f": 6, "g": 7, "h": 8},
-            {"a": 10, "b": 20, "c": 30, "d": 40, "e": 50, "f": 60, "g": 70, "h": 80},
-        ]
+    # Regression pins for cases the property test has shrunk to before
+
+    def test_roundtrip_escaped_quote_before_later_cells(self) -> None:
+        data = [{"a": 'x"y'}, {"a": "z"}]
         encoded = AGONColumns.encode(data, include_header=True)
-        decoded = AGONColumns.decode(encoded)
-        assert decoded == data
+        assert AGONColumns.decode(encoded) == data
+
+    def test_roundtrip_missing_leading_cell(self) -> None:
+        data = [{"a": 1}, {"a": 2, "b": "y"}, {"b": "z"}]
+        encoded = AGONColumns.encode(data, include_header=True)
+        assert AGONColumns.decode(encoded) == data
+
+    @pytest.mark.xfail(strict=True, reason="rows with no keys are encoded as nothing")
+    def test_roundtrip_table_of_empty_objects(self) -> None:
+        data: list[dict[str, Any]] = [{}, {}]
+        encoded = AGONColumns.encode(data, include_header=True)
+        assert AGONColumns.decode(encoded) == data
 
 
 class TestAGONColumnsArrays:
@@ -368,37 +381,62 @@ class TestAGONColumnsArrays:
 class TestAGONColumnsIntegration:
     """Integration tests with AGON core."""
 
-    def test_agon_encode_columns_format(self, simple_data: list[dict[str, Any]]) -> None:
-        result = AGON.encode(simple_data, format="columns")
-        assert result.format == "columns"
-        assert result.header == "@AGON columns"
+    @pytest.fixture(scope="class")
+    def encoded(self, simple_data: list[dict[str, Any]]) -> AGONEncoding:
+        return AGON.encode(simple_data, format="columns")
 
-    def test_agon_decode_detects_columns_format(self, simple_data: list[dict[str, Any]]) -> None:
-        encoded = AGONColumns.encode(simple_data, include_header=True)
-        decoded = AGON.decode(encoded)
-        assert decoded == simple_data
+    def test_encode_columns_format(
+        self, simple_data: list[dict[str, Any]], encoded: AGONEncoding
+    ) -> None:
+        assert encoded.format == "columns"
+        assert encoded.header == "@AGON columns"
+        assert AGON.decode(encoded) == simple_data
 
-    def test_agon_decode_encoding_directly(self, simple_data: list[dict[str, Any]]) -> None:
-        result = AGON.encode(simple_data, format="columns")
-        decoded = AGON.decode(result)
-        assert decoded == simple_data
+    def test_decode_detects_columns_format(
+        self, simple_data: list[dict[str, Any]], encoded: AGONEncoding
+    ) -> None:
+        assert AGON.decode(encoded.with_header()) == simple_data
 
-    def test_agon_auto_includes_columns_in_candidates(
-        self, simple_data: list[dict[str, Any]]
+    def test_decode_encoding_directly(
+        self, simple_data: list[dict[str, Any]], encoded_simple_data: str
+    ) -> None:
+        # Build the result directly; AGON.encode wiring is covered above
+        text = encoded_simple_data.removeprefix("@AGON columns\n\n")
+        assert AGON.decode(AGONEncoding("columns", text, "@AGON columns")) == simple_data
+
+    def test_auto_forwards_options_to_rust_selector(
+        self,
+        simple_data: list[dict[str, Any]],
+        encoded_simple_data: str,
+        monkeypatch: pytest.MonkeyPatch,
     ) -> None:
+        # Real selection of columns is test_core's test_auto_can_select_columns;
+        # this only checks that the wrapper forwards options and wraps the result
+        text = encoded_simple_data.removeprefix("@AGON columns\n\n")
+        calls: list[tuple[object, ...]] = []
+
+        def select(*args: object) -> SimpleNamespace:
+            calls.append(args)
+            return SimpleNamespace(format="columns", text=text, header="@AGON columns")
+
+        monkeypatch.setattr(agon_core, "_rs_encode_auto_parallel", select)
         result = AGON.encode(simple_data, format="auto")
-        assert result.format in ("json", "rows", "columns", "struct")
+
+        assert calls == [(simple_data, False, 0.10, None)]
+        assert result.format == "columns"
+        assert result.header == "@AGON columns"
+        assert AGON.decode(result) == simple_data
 
 
 class TestAGONColumnsErrors:
     """Error handling tests."""
 
     def test_invalid_header(self) -> None:
-        with pytest.raises(ValueError):
+        with pytest.raises(ValueError, match=_RE_INVALID_HEADER):
             AGONColumns.decode("not a valid header")
 
     def test_empty_payload(self) -> None:
-        with pytest.raises(ValueError):
+        with pytest.raises(ValueError, match=_RE_EMPTY_PAYLOAD):
             AGONColumns.decode("")
 
 
@@ -436,7 +474,6 @@ class TestAGONColumnsTokenEfficiency:
         ]
         encoded = AGONColumns.encode(data, include_header=True)
         # Values should be tab-separated
-        assert "price: 9.99\t19.99\t29.99" in encoded
-        assert "qty: 10\t20\t30" in encoded
+        assert_contains_all(encoded, ["price: 9.99\t19.99\t29.99", "qty: 10\t20\t30"])
         decoded = AGONColumns.decode(encoded)
         assert decoded == data
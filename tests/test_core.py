@@ -11,13 +11,14 @@ from typing import Any
 import orjson
 import pytest
 
-from agon import AGON, AGONError, AGONRows
+from agon import AGON, AGONEncoding, AGONError, AGONRows
 
 
 def test_encode_json_format_returns_json() -> None:
     data: dict[str, Any] = {"a": 1, "b": [1, 2, 3]}
     result = AGON.encode(data, format="json")
-    assert orjson.loads(result.text) == data
+    # Compact JSON in insertion order, compared byte for byte rather than re-parsed
+    assert result.text == orjson.dumps(data).decode()
 
 
 def test_encode_rows_format_uses_header() -> None:
@@ -30,7 +31,7 @@ def test_encode_rows_format_uses_header() -> None:
 def test_encode_routes_to_specific_formats(simple_data: list[dict[str, Any]]) -> None:
     res_json = AGON.encode(simple_data, format="json")
     assert res_json.format == "json"
-    assert isinstance(orjson.loads(res_json.text), list)
+    assert res_json.text == orjson.dumps(simple_data).decode()
 
     res_rows = AGON.encode(simple_data, format="rows")
     assert res_rows.format == "rows"
@@ -50,16 +51,63 @@ def test_encode_struct_includes_definitions_without_header() -> None:
     assert "@FR: fmt, raw" in result.text
 
 
+def test_encode_many_matches_encode(simple_data: list[dict[str, Any]]) -> None:
+    datasets: list[object] = [simple_data, {"a": 1}, [1, 2, 3], simple_data[:1]]
+    results = AGON.encode_many(datasets, format="rows", workers=2)
+    assert results == [AGON.encode(d, format="rows") for d in datasets]
+
+
+def test_encode_many_auto_preserves_order(simple_data: list[dict[str, Any]]) -> None:
+    datasets: list[object] = [simple_data, {"x": "y"}]
+    results = AGON.encode_many(datasets)
+    assert [AGON.decode(r) for r in results] == datasets
+
+
 def test_decode_detects_rows_payload() -> None:
     payload = AGONRows.encode({"x": 1}, include_header=True)
     assert AGON.decode(payload) == {"x": 1}
 
 
+@pytest.mark.parametrize("fmt", ["rows", "columns", "struct"])
+def test_decode_detects_header_by_name(fmt: str) -> None:
+    data = [{"id": 1, "name": "Alice"}, {"id": 2, "name": "Bob"}]
+    result = AGON.encode(data, format=fmt)  # type: ignore[arg-type]
+    assert AGON.decode(result.with_header()) == data
+    assert AGON.decode(f"{result.header}\r\n\r\n{result.text}") == data
+
+
+@pytest.mark.parametrize("fmt", ["json", "rows", "columns", "struct"])
+def test_decode_tolerates_surrounding_whitespace(fmt: str) -> None:
+    data = [{"id": 1, "name": "Alice"}, {"id": 2, "name": "Bob"}]
+    result = AGON.encode(data, format=fmt)  # type: ignore[arg-type]
+    assert AGON.decode(f"\n  {result.with_header()}\n\n  \n") == data
+    assert AGON.decode(f"  {result.text}\t\n", format=result.format) == data
+
+
+def test_decode_unknown_agon_header_falls_back_to_json() -> None:
+    with pytest.raises(AGONError, match="Invalid JSON"):
+        AGON.decode("@AGON bogus\n\nx: 1")
+
+
 def test_decode_raw_json_list_roundtrip() -> None:
     raw = '[{"id": 1, "name": "Test"}]'
     assert AGON.decode(raw) == [{"id": 1, "name": "Test"}]
 
 
+def test_decode_bytes_payloads() -> None:
+    data = [{"id": 1, "name": "Test"}]
+    rows = AGON.encode(data, format="rows")
+    assert AGON.decode(b'  [{"id": 1, "name": "Test"}]') == data
+    assert AGON.decode(bytearray(b'[{"id": 1, "name": "Test"}]'), format="json") == data
+    assert AGON.decode(rows.with_header().encode()) == data
+    assert AGON.decode(rows.text.encode(), format="rows") == data
+
+
+def test_decode_invalid_utf8_bytes_raises() -> None:
+    with pytest.raises(AGONError, match="Invalid UTF-8"):
+        AGON.decode(b"@AGON rows\n\n\xff", format="rows")
+
+
 def test_decode_invalid_json_raises() -> None:
     with pytest.raises(AGONError, match="Invalid JSON"):
         AGON.decode("{invalid json")
@@ -93,63 +141,31 @@ def test_project_data_delegates() -> None:
     assert AGON.project_data(data, ["id"]) == [{"id": 1}]
 
 
-def test_hint_with_agon_encoding_result() -> None:
-    """AGONEncoding.hint() should return prescriptive generation instructions."""
-    data = [{"id": 1, "name": "Alice"}]
-    result = AGON.encode(data, format="rows")
-    hint = result.hint()
-    assert isinstance(hint, str)
-    assert "Return in AGON rows format" in hint
-    assert "@AGON rows header" in hint
-
-
-def test_hint_rows_format() -> None:
-    """hint() should return rows format instructions."""
-    result = AGON.encode({"a": 1}, format="rows")
-    hint = result.hint()
-    assert isinstance(hint, str)
-    assert "Return in AGON rows format" in hint
-    assert "@AGON rows header" in hint
-    assert "name[N]{fields}" in hint
-
-
-def test_hint_columns_format() -> None:
-    """hint() should return columns format instructions."""
-    result = AGON.encode([{"id": 1}], format="columns")
-    hint = result.hint()
-    assert isinstance(hint, str)
-    assert "Return in AGON columns format" in hint
-    assert "@AGON columns header" in hint
-    assert "├/└" in hint
-
-
-def test_hint_struct_format() -> None:
-    """hint() should return struct format instructions."""
-    result = AGON.encode({"a": {"fmt": "1", "raw": 1}}, format="struct")
-    hint = result.hint()
-    assert isinstance(hint, str)
-    assert "Return in AGON struct format" in hint
-    assert "@AGON struct header" in hint
-    assert "@Struct" in hint or "Struct(" in hint
+# Substrings each format's generation hint must contain
+_HINT_FRAGMENTS: dict[str, tuple[str, ...]] = {
+    "rows": ("Return in AGON rows format", "@AGON rows header", "name[N]{fields}"),
+    "columns": ("Return in AGON columns format", "@AGON columns header", "├/└"),
+    "struct": ("Return in AGON struct format", "@AGON struct header", "@Struct", "Struct("),
+    "json": ("JSON",),
+}
 
 
-def test_hint_json_format() -> None:
-    """hint() should return JSON format hint."""
-    result = AGON.encode({"a": 1}, format="json")
-    hint = result.hint()
+@pytest.mark.parametrize("fmt", list(_HINT_FRAGMENTS))
+def test_hint_per_format(fmt: str, encoded_by_format: dict[str, AGONEncoding]) -> None:
+    """AGONEncoding.hint() should return prescriptive instructions for its format."""
+    hint = encoded_by_format[fmt].hint()
     assert isinstance(hint, str)
-    assert "JSON" in hint
-
+    for fragment in _HINT_FRAGMENTS[fmt]:
+        assert fragment in hint
+    # Hints depend only on the format, not on the encoded data
+    assert hint == AGONEncoding(encoded_by_format[fmt].format, "").hint()
 
-def test_hint_matches_across_formats() -> None:
-    """hint() should return consistent hints for each format."""
-    data = [{"id": 1, "name": "Alice"}]
 
-    for fmt in ["rows", "columns", "struct", "json"]:
-        result = AGON.encode(data, format=fmt)  # type: ignore[arg-type]
-        hint = result.hint()
-        assert isinstance(hint, str)
-        assert len(hint) > 0
+def test_hint_unknown_format_raises() -> None:
+    """hint() should reject formats it has no hint for."""
+    result = AGONEncoding("auto", "")
+    with pytest.raises(AGONError, match="Unknown format"):
+        result.hint()
 
 
 def test_count_tokens_positive() -> None:
@@ -207,6 +223,14 @@ def test_auto_format_selects_best() -> None:
     assert result.format in ("json", "rows", "columns", "struct")
 
 
+def test_auto_can_select_columns() -> None:
+    """Repeated multi-word values tokenize cheaper column-wise than row-wise."""
+    data = [{"a": "x y", "b": "q"} for _ in range(10)]
+    result = AGON.encode(data, format="auto", encoding="o200k_base")
+    assert result.format == "columns"
+    assert AGON.decode(result) == data
+
+
 def test_force_skips_json() -> None:
     """With force=True, auto should not select JSON."""
     data: dict[str, Any] = {"a": 1}
@@ -214,21 +238,19 @@ def test_force_skips_json() -> None:
     assert result.format == "rows"
 
 
-def test_auto_min_savings_can_fall_back_to_json() -> None:
+def test_auto_min_savings_can_fall_back_to_json(uniform_records: list[dict[str, Any]]) -> None:
     # Make it very likely that a non-JSON format wins token-counting,
     # then force an impossible savings threshold so it must fall back.
-    records = [{"id": i, "name": "Alice"} for i in range(60)]
-
-    result = AGON.encode(records, format="auto", min_savings=1.0)
+    result = AGON.encode(uniform_records, format="auto", min_savings=1.0)
     assert result.format == "json"
     assert result.text.startswith("[")
 
 
-def test_auto_min_savings_allows_best_format_when_threshold_met() -> None:
+def test_auto_min_savings_allows_best_format_when_threshold_met(
+    uniform_records: list[dict[str, Any]],
+) -> None:
     # Ensure we cover the non-fallback path of min_savings logic.
-    records = [{"id": i, "name": "Alice"} for i in range(60)]
-
-    result = AGON.encode(records, format="auto", min_savings=0.0)
+    result = AGON.encode(uniform_records, format="auto", min_savings=0.0)
     assert result.format != "json"
 
 
@@ -239,10 +261,8 @@ def test_auto_force_excludes_json_candidate() -> None:
     assert result.format != "json"
 
 
-def test_encode_reports_json_fallback() -> None:
-    records = [{"id": i, "name": "Alice"} for i in range(60)]
-
-    res = AGON.encode(records, format="auto", min_savings=1.0)
+def test_encode_reports_json_fallback(uniform_records: list[dict[str, Any]]) -> None:
+    res = AGON.encode(uniform_records, format="auto", min_savings=1.0)
     assert res.format == "json"
     assert res.text.startswith("[")
 
@@ -5,12 +5,85 @@ Tests encoding and decoding of the AGONRows row-based format.
 
 from __future__ import annotations
 
-import textwrap
 from typing import Any
 
 import pytest
 
-from agon import AGON, AGONRows
+from agon import AGON, AGONEncoding, AGONRows
+
+# Decode payloads as flush-left literals, so no test dedents at run time
+_PAYLOAD_TABULAR = (
+    "@AGON rows\n"
+    "\n"
+    "products[3]{sku\tname\tprice}\n"
+    "A123\tWidget\t9.99\n"
+    "B456\tGadget\t19.99\n"
+    "C789\tGizmo\t29.99\n"
+)
+
+_PAYLOAD_TABULAR_UNNAMED = (
+    "@AGON rows\n"
+    "\n"
+    "[3]{sku\tname\tprice}\n"
+    "A123\tWidget\t9.99\n"
+    "B456\tGadget\t19.99\n"
+    "C789\tGizmo\t29.99\n"
+)
+
+_PAYLOAD_MISSING_VALUES = (
+    "@AGON rows\n"
+    "\n"
+    "users[3]{id\tname\temail}\n"
+    "1\tAlice\talice@example.com\n"
+    "2\tBob\t\n"
+    "3\t\tcarol@example.com\n"
+)
+
+_PAYLOAD_PRIMITIVE_ARRAY = "@AGON rows\n\ntags[4]: admin\tops\tdev\tuser\n"
+
+_PAYLOAD_ESCAPED_QUOTE = '@AGON rows\n\nvals[2]: "a\\"b"\t"c"\n'
+
+_PAYLOAD_LIST_OBJECTS = (
+    "@AGON rows\n\nrecords[2]:\n  - name: Alice\n    age: 30\n  - name: Bob\n    age: 25\n"
+)
+
+_PAYLOAD_LIST_PRIMITIVES = "@AGON rows\n\nvals[2]:\n  - 1\n  - 2\n"
+
+_PAYLOAD_NEWLINE_DELIMITER = '@AGON rows\n@D=\\n\n\ns: "x"\n'
+
+_PAYLOAD_TAB_DELIMITER = '@AGON rows\n@D=\\t\n\ns: "x"\n'
+
+_PAYLOAD_PRIMITIVES = "@AGON rows\n\nvalue: 42\nname: Alice\nactive: true\nmissing: null\n"
+
+_PAYLOAD_NAMED_ARRAYS = (
+    "@AGON rows\n"
+    "\n"
+    "root:\n"
+    "  nums[2]: 1\t2\n"
+    "  rows[2]{a\tb}\n"
+    "  1\t2\n"
+    "  3\t4\n"
+    "  items[1]:\n"
+    "    - x: 1\n"
+    "      y:\n"
+    "        z: 2\n"
+)
+
+
+# Roundtrip inputs, encoded once at import; the decode tests share the text
+_SIMPLE: dict[str, Any] = {"name": "Alice", "age": 30}
+_NESTED: dict[str, Any] = {
+    "company": "ACME",
+    "address": {
+        "street": "123 Main St",
+        "city": "Seattle",
+    },
+}
+_NUMBERS: dict[str, Any] = {"numbers": [1, 2, 3, 4, 5]}
+
+_ENCODED_SIMPLE = AGONRows.encode(_SIMPLE, include_header=True)
+_ENCODED_NESTED = AGONRows.encode(_NESTED, include_header=True)
+_ENCODED_NUMBERS = AGONRows.encode(_NUMBERS, include_header=True)
 
 
 class TestAGONRowsBasic:
@@ -25,22 +98,10 @@ class TestAGONRowsBasic:
         assert "active: true" in encoded
 
     def test_encode_decode_roundtrip_simple(self) -> None:
-        data = {"name": "Alice", "age": 30}
-        encoded = AGONRows.encode(data, include_header=True)
-        decoded = AGONRows.decode(encoded)
-        assert decoded == data
+        assert AGONRows.decode(_ENCODED_SIMPLE) == _SIMPLE
 
     def test_encode_decode_roundtrip_nested(self) -> None:
-        data = {
-            "company": "ACME",
-            "address": {
-                "street": "123 Main St",
-                "city": "Seattle",
-            },
-        }
-        encoded = AGONRows.encode(data, include_header=True)
-        decoded = AGONRows.decode(encoded)
-        assert decoded == data
+        assert AGONRows.decode(_ENCODED_NESTED) == _NESTED
 
     def test_empty_object_roundtrip(self) -> None:
         data: dict[str, Any] = {}
@@ -59,16 +120,7 @@ class TestAGONRowsTabular:
 
     def test_decode_tabular_array(self) -> None:
         # Named array at root level - decodes to object with array value
-        payload = textwrap.dedent(
-            """\
-            @AGON rows
-
-            products[3]{sku\tname\tprice}
-            A123\tWidget\t9.99
-            B456\tGadget\t19.99
-            C789\tGizmo\t29.99
-            """
-        )
+        payload = _PAYLOAD_TABULAR
         decoded = AGONRows.decode(payload)
         assert "products" in decoded
         products = decoded["products"]
@@ -79,36 +131,19 @@ class TestAGONRowsTabular:
 
     def test_decode_tabular_array_unnamed(self) -> None:
         # Unnamed array at root - decodes to bare array
-        payload = textwrap.dedent(
-            """\
-            @AGON rows
-
-            [3]{sku\tname\tprice}
-            A123\tWidget\t9.99
-            B456\tGadget\t19.99
-            C789\tGizmo\t29.99
-            """
-        )
+        payload = _PAYLOAD_TABULAR_UNNAMED
         decoded = AGONRows.decode(payload)
         assert len(decoded) == 3
         assert decoded[0] == {"sku": "A123", "name": "Widget", "price": 9.99}
 
-    def test_roundtrip_tabular_array(self, simple_data: list[dict[str, Any]]) -> None:
-        encoded = AGONRows.encode(simple_data, include_header=True)
-        decoded = AGONRows.decode(encoded)
+    def test_roundtrip_tabular_array(
+        self, simple_data: list[dict[str, Any]], encoded_by_format: dict[str, AGONEncoding]
+    ) -> None:
+        decoded = AGONRows.decode(encoded_by_format["rows"].with_header())
         assert decoded == simple_data
 
     def test_tabular_with_missing_values(self) -> None:
-        payload = textwrap.dedent(
-            """\
-            @AGON rows
-
-            users[3]{id\tname\temail}
-            1\tAlice\talice@example.com
-            2\tBob\t
-            3\t\tcarol@example.com
-            """
-        )
+        payload = _PAYLOAD_MISSING_VALUES
         decoded = AGONRows.decode(payload)
         users = decoded["users"]
         assert len(users) == 3
@@ -126,30 +161,15 @@ class TestAGONRowsPrimitiveArrays:
         assert "[3]:" in encoded
 
     def test_decode_primitive_array(self) -> None:
-        payload = textwrap.dedent(
-            """\
-            @AGON rows
-
-            tags[4]: admin\tops\tdev\tuser
-            """
-        )
+        payload = _PAYLOAD_PRIMITIVE_ARRAY
         decoded = AGONRows.decode(payload)
         assert decoded == {"tags": ["admin", "ops", "dev", "user"]}
 
     def test_roundtrip_primitive_array(self) -> None:
-        data = {"numbers": [1, 2, 3, 4, 5]}
-        encoded = AGONRows.encode(data, include_header=True)
-        decoded = AGONRows.decode(encoded)
-        assert decoded == data
+        assert AGONRows.decode(_ENCODED_NUMBERS) == _NUMBERS
 
     def test_decode_primitive_array_with_escaped_quote(self) -> None:
-        payload = textwrap.dedent(
-            """\
-            @AGON rows
-
-            vals[2]: "a\\\"b"\t"c"
-            """
-        )
+        payload = _PAYLOAD_ESCAPED_QUOTE
         assert AGONRows.decode(payload) == {"vals": ['a"b', "c"]}
 
     def test_empty_array_roundtrip(self) -> None:
@@ -169,17 +189,7 @@ class TestAGONRowsMixedArrays:
         assert "items[4]:" in encoded
 
     def test_decode_list_array_with_objects(self) -> None:
-        payload = textwrap.dedent(
-            """\
-            @AGON rows
-
-            records[2]:
-              - name: Alice
-                age: 30
-              - name: Bob
-                age: 25
-            """
-        )
+        payload = _PAYLOAD_LIST_OBJECTS
         decoded = AGONRows.decode(payload)
         records = decoded["records"]
         assert len(records) == 2
@@ -187,38 +197,16 @@ class TestAGONRowsMixedArrays:
         assert records[1] == {"name": "Bob", "age": 25}
 
     def test_decode_list_array_header_with_no_inline_values(self) -> None:
-        payload = textwrap.dedent(
-            """\
-            @AGON rows
-
-            vals[2]:
-              - 1
-              - 2
-            """
-        )
+        payload = _PAYLOAD_LIST_PRIMITIVES
         assert AGONRows.decode(payload) == {"vals": [1, 2]}
 
     def test_parses_newline_delimiter_header(self) -> None:
         # Delimiter may not be used in the body, but header parsing should accept it.
-        payload = textwrap.dedent(
-            """\
-            @AGON rows
-            @D=\\n
-
-            s: "x"
-            """
-        )
+        payload = _PAYLOAD_NEWLINE_DELIMITER
         assert AGONRows.decode(payload) == {"s": "x"}
 
     def test_parses_tab_delimiter_header(self) -> None:
-        payload = textwrap.dedent(
-            """\
-            @AGON rows
-            @D=\\t
-
-            s: "x"
-            """
-        )
+        payload = _PAYLOAD_TAB_DELIMITER
         assert AGONRows.decode(payload) == {"s": "x"}
 
     def test_quotes_strings_that_look_like_primitives(self) -> None:
@@ -266,16 +254,7 @@ class TestAGONRowsPrimitives:
         assert "inf: null" in encoded
 
     def test_decode_primitives(self) -> None:
-        payload = textwrap.dedent(
-            """\
-            @AGON rows
-
-            value: 42
-            name: Alice
-            active: true
-            missing: null
-            """
-        )
+        payload = _PAYLOAD_PRIMITIVES
         decoded = AGONRows.decode(payload)
         assert decoded == {"value": 42, "name": "Alice", "active": True, "missing": None}
 
@@ -350,21 +329,7 @@ class TestAGONRowsNesting:
         assert decoded == nested_data
 
     def test_decode_object_with_named_arrays(self) -> None:
-        payload = textwrap.dedent(
-            """\
-            @AGON rows
-
-            root:
-              nums[2]: 1\t2
-              rows[2]{a\tb}
-              1\t2
-              3\t4
-              items[1]:
-                - x: 1
-                  y:
-                    z: 2
-            """
-        )
+        payload = _PAYLOAD_NAMED_ARRAYS
         assert AGONRows.decode(payload) == {
             "root": {
                 "nums": [1, 2],
@@ -402,13 +367,16 @@ class TestAGONRowsIntegration:
 class TestAGONRowsErrors:
     """Error handling tests."""
 
-    def test_invalid_header(self) -> None:
-        with pytest.raises(ValueError):
-            AGONRows.decode("not a valid header")
-
-    def test_empty_payload(self) -> None:
-        with pytest.raises(ValueError):
-            AGONRows.decode("")
+    @pytest.mark.parametrize(
+        ("payload", "match"),
+        [
+            pytest.param("not a valid header", "Invalid header", id="invalid_header"),
+            pytest.param("", "Empty payload", id="empty_payload"),
+        ],
+    )
+    def test_decode_errors(self, payload: str, match: str) -> None:
+        with pytest.raises(ValueError, match=match):
+            AGONRows.decode(payload)
 
 
 class TestAGONRowsHint: